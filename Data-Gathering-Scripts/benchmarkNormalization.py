@@ -0,0 +1,69 @@
+'''
+Times the Tweet text cleaning done before tokenizing.
+
+Compares the pandas chain the tokenizers used (str.lower, str.encode,
+str.decode and DataFrame.replace with a dict of regexes, each making a copy of
+the text column) with tokenizerEngine.normalizeTweet, which cleans each Tweet
+in one pass. Checks that both give the same text, with and without removing
+newlines.
+
+Keyword arguments:
+tweetFile -- the file which contains all the Tweets, either allTweets.csv or the
+             allTweets_parquet store written by combineTweetCSVs.py
+numTweets -- (optional) the number of Tweets to time, default 200000
+repeats -- (optional) the number of times each method is run, the best time is kept
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import sys
+import time
+import tweetStore
+import tokenizerEngine
+
+
+def chainClean(tweets, removeNewlines=False):
+    '''Clean the text the way the tokenizers did before normalizeTweet.'''
+    tweets = tweets.copy()
+    tweets['text'] = tweets['text'].str.lower().str.encode('ascii', 'ignore').str.decode('ascii')
+    patterns = {r"http\S+": "", '#{1,}': ""}
+    if removeNewlines:
+        patterns['\n'] = ""
+    tweets = tweets.replace({'text': patterns}, regex=True)
+    return tweets['text'].tolist()
+
+
+def normalizeClean(tweets, removeNewlines=False):
+    '''Clean the text in one pass for each Tweet.'''
+    return [tokenizerEngine.normalizeTweet(text, removeNewlines) for text in tweets['text']]
+
+
+def bestTime(function, tweets, removeNewlines, repeats):
+    '''Run a cleaning function repeats times, returning the fastest time and the cleaned text.'''
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cleaned = function(tweets, removeNewlines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, cleaned
+
+
+def main(tweetFile, numTweets=200000, repeats=3):
+    tweets = tweetStore.readTweets(tweetFile, ['text']).head(int(numTweets))
+    tweets = tweets[tweets['text'].notna()]
+
+    for removeNewlines in [False, True]:
+        chainTime, chainText = bestTime(chainClean, tweets, removeNewlines, int(repeats))
+        normalizeTime, normalizeText = bestTime(normalizeClean, tweets, removeNewlines, int(repeats))
+
+        print('{} Tweets, removing newlines: {}'.format(len(tweets), removeNewlines))
+        print('    pandas chain:   {:.3f}s'.format(chainTime))
+        print('    normalizeTweet: {:.3f}s ({:.1f}x)'.format(normalizeTime, chainTime / normalizeTime))
+        print('    same text: {}'.format(chainText == normalizeText))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
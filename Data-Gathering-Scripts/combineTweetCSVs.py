@@ -4,6 +4,23 @@ Combines all CSVs which contain hydrated Twitter data.
 Requires a folder named "tweet_data" which contains the CSVs to be combined.
 Outputs a file titled "allTweets.csv".
 
+Usage:
+    python combineTweetCSVs.py [memory|stream] [chunksize] [csv|parquet] [exact|bloom|none]
+
+memory -- (default) reads every CSV into one dataframe and sorts it by timestamp
+stream -- sorts each CSV, in chunks of chunksize rows (default 500000), into a
+          temporary run file and then does a k-way merge of the runs by timestamp
+          straight into allTweets.csv. Only one row per run is held in memory
+          during the merge, so the corpus can be larger than RAM.
+parquet -- also writes allTweets_parquet, a compressed Parquet dataset of the Tweets
+           partitioned by date (see tweetStore.py). The tokenizer and time series
+           scripts can be passed this folder instead of allTweets.csv.
+exact -- (default) drops Tweets whose id was already seen in an earlier file or row,
+         using a compact int64 hash set (see idFilters.py)
+bloom -- drops duplicate ids with a Bloom filter in fixed memory, for corpora too
+         large for the exact set. About 0.1% of unique Tweets may also be dropped.
+none -- keeps duplicate Tweets
+
 Laura Stagnaro, Ian Byrne
 SIADS 591 & 592 Milestone I
 Coronavirus Tweet Analysis Project
@@ -11,19 +28,53 @@ Coronavirus Tweet Analysis Project
 '''
 import pandas as pd
 import os
+import sys
+import csv
+import heapq
+import tempfile
+import tweetStore
+import idFilters
 
-def main():
+COLUMNS = ['id', 'timestamp', 'text', 'hashtag', 'location', 'lang', 'sentimentScore', 'status']
+MAX_OPEN_RUNS = 256 # Merge at most this many runs at once to stay under the open file limit
+
+def main(mode='memory', chunksize=500000, output='csv', dedup='exact'):
     '''Concatenate all CSVs with Twitter information.'''
     
+    idFilter = idFilters.makeIdFilter(dedup)
+    
+    if mode == 'stream':
+        streamCombine(int(chunksize), idFilter)
+    else:
+        memoryCombine(idFilter)
+    
+    if idFilter is not None:
+        print('Dropped {} duplicate Tweets'.format(idFilter.duplicates))
+    
+    if output == 'parquet':
+        tweetStore.writeTweetStore('allTweets.csv', 'allTweets_parquet', int(chunksize))
+
+def memoryCombine(idFilter=None):
+    '''Concatenate all CSVs with Twitter information in memory.
+    
+    Keyword argument:
+    idFilter -- (optional) IdHashSet or IdBloomFilter used to drop duplicate Tweet ids
+    
+    '''
     directory = 'tweet_data/'
-    twitterDf = pd.DataFrame(columns = ['id', 'timestamp', 'text', 'hashtag', 'location', 'lang', 'sentimentScore', 'status'])
+    tweetDfs = [pd.DataFrame(columns = COLUMNS)]
     
-    for filename in os.listdir(directory):
+    for filename in sorted(os.listdir(directory)):
         
         if filename.endswith(".csv"):
             df = pd.read_csv(directory + filename)
-            twitterDf = twitterDf.append(df, ignore_index=True)
+            if idFilter is not None:
+                df = df[idFilter.addNew(df['id'])]
+            tweetDfs.append(df)
             print(directory + filename, len(df))
+    
+    # Concatenate once instead of appending each file
+    twitterDf = pd.concat(tweetDfs, ignore_index=True)
         
     # Sort the tweets by timestamp
     twitterDf = twitterDf.sort_values('timestamp')
@@ -31,5 +82,99 @@ def main():
     twitterDf.to_csv('allTweets.csv', index=False) # Create the csv file
     print('{} created with {} Tweets'.format('allTweets.csv', len(twitterDf)))
 
+def sortedRuns(directory, runDirectory, chunksize, idFilter=None):
+    '''Sort each CSV by timestamp in chunks and write each sorted chunk to its own run file.
+    
+    Keyword arguments:
+    directory -- the folder with the hydrated Tweet CSVs
+    runDirectory -- the folder to write the run files to
+    chunksize -- the number of rows to sort at once
+    idFilter -- (optional) IdHashSet or IdBloomFilter used to drop duplicate Tweet ids
+    
+    Return:
+    runFiles -- list of the run file paths
+    
+    '''
+    runFiles = []
+    
+    for filename in sorted(os.listdir(directory)):
+        
+        if filename.endswith(".csv"):
+            rows = 0
+            for chunk in pd.read_csv(directory + filename, chunksize=chunksize):
+                if idFilter is not None:
+                    chunk = chunk[idFilter.addNew(chunk['id'])]
+                chunk = chunk.reindex(columns=COLUMNS).sort_values('timestamp', kind='mergesort')
+                runFile = os.path.join(runDirectory, 'run_{}.csv'.format(len(runFiles)))
+                chunk.to_csv(runFile, index=False)
+                runFiles.append(runFile)
+                rows += len(chunk)
+            print(directory + filename, rows)
+    
+    return runFiles
+
+def mergeRuns(runFiles, outputFile):
+    '''Merge run files which are each sorted by timestamp into one sorted CSV.
+    
+    Keyword arguments:
+    runFiles -- list of the sorted run file paths
+    outputFile -- the CSV to write the merged rows to
+    
+    Return:
+    numRows -- the number of rows written
+    
+    '''
+    files = [open(runFile, newline='', encoding='utf-8') for runFile in runFiles]
+    try:
+        readers = []
+        for file in files:
+            reader = csv.reader(file)
+            next(reader) # Skip the header
+            readers.append(reader)
+        
+        timestampIdx = COLUMNS.index('timestamp')
+        numRows = 0
+        with open(outputFile, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(COLUMNS)
+            for row in heapq.merge(*readers, key=lambda row: row[timestampIdx]):
+                writer.writerow(row)
+                numRows += 1
+    finally:
+        for file in files:
+            file.close()
+    
+    return numRows
+
+def streamCombine(chunksize=500000, idFilter=None):
+    '''Combine all CSVs with Twitter information with an external sort by timestamp.
+    
+    Keyword arguments:
+    chunksize -- the number of rows to sort at once
+    idFilter -- (optional) IdHashSet or IdBloomFilter used to drop duplicate Tweet ids
+    
+    '''
+    directory = 'tweet_data/'
+    
+    with tempfile.TemporaryDirectory(dir='.') as runDirectory:
+        runFiles = sortedRuns(directory, runDirectory, chunksize, idFilter)
+        
+        # Merge the runs in rounds when there are too many to open at once
+        level = 0
+        while len(runFiles) > MAX_OPEN_RUNS:
+            mergedFiles = []
+            for i in range(0, len(runFiles), MAX_OPEN_RUNS):
+                mergedFile = os.path.join(runDirectory, 'merged_{}_{}.csv'.format(level, len(mergedFiles)))
+                mergeRuns(runFiles[i:i + MAX_OPEN_RUNS], mergedFile)
+                for runFile in runFiles[i:i + MAX_OPEN_RUNS]:
+                    os.remove(runFile)
+                mergedFiles.append(mergedFile)
+            runFiles = mergedFiles
+            level += 1
+        
+        numRows = mergeRuns(runFiles, 'allTweets.csv')
+    
+    print('{} created with {} Tweets'.format('allTweets.csv', numRows))
+
 if __name__ == "__main__":
-    main()
+    main(*sys.argv[1:])
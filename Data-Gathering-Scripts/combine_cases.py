@@ -1,10 +1,19 @@
 '''Script to loop through the directory with all
 of the covid case data by country and combine it
 into the a single .csv
+
+Usage:
+    python combine_cases.py [workers]
+
+Passing a number of workers reads the daily files in
+parallel worker processes. Files are combined in sorted
+order so the output matches the serial run.
 '''
 
 import os
+import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 
 def process_cases(df):
@@ -25,27 +34,44 @@ def process_cases(df):
     return clean_df
 
 
-def combined_samples():
+def read_day(path):
+    '''reads a single daily case file, run by each worker process'''
+
+    return pd.read_csv(path)
+
+
+def combined_samples(workers=1):
     '''
     lists through all .csv files in case_data folder
     to create one file with all dates.
     '''
 
     directory = 'case_data/'
-    combined_cases = pd.DataFrame(columns=[
+    days = [pd.DataFrame(columns=[
         'FIPS', 'Admin2', 'Province_State', 'Country_Region', 'Last_Update',
         'Lat', 'Long_', 'Confirmed', 'Deaths', 'Recovered', 'Active',
         'Combined_Key', 'Incidence_Rate', 'Case-Fatality_Ratio'
-    ])
-
-    for filename in os.listdir(directory):
-
-        if filename.endswith(".csv"):
-            day = pd.read_csv(directory+filename)
-
-            combined_cases = combined_cases.append(day, ignore_index=True)
-            print(filename, len(day), len(combined_cases))
-
+    ])]
+
+    filenames = sorted(filename for filename in os.listdir(directory)
+                       if filename.endswith(".csv"))
+    paths = [directory + filename for filename in filenames]
+
+    if workers > 1:
+        # map returns the frames in the order the files were submitted
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            day_frames = list(executor.map(read_day, paths))
+    else:
+        day_frames = map(read_day, paths)
+
+    total = 0
+    for filename, day in zip(filenames, day_frames):
+        days.append(day)
+        total += len(day)
+        print(filename, len(day), total)
+
+    # concatenate once at the end instead of appending per file
+    combined_cases = pd.concat(days, ignore_index=True)
     print(len(combined_cases))
     return combined_cases
 
@@ -57,10 +83,10 @@ def write_file(df):
     df.to_csv('covid_case_data.csv', chunksize=25000)
 
 
-def main():
+def main(workers=1):
     '''Combines cases, processes, then writes to file'''
 
-    allcases = combined_samples()
+    allcases = combined_samples(int(workers))
     print('all cases combined')
 
     final = process_cases(allcases)
@@ -71,4 +97,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(*sys.argv[1:])
@@ -0,0 +1,86 @@
+'''
+Labels dates with the covid phase they fell into.
+
+The phases are read from covidPhases.json in the working directory when it
+exists, otherwise the phases of the project are used:
+    phase 1 -- 2020-03-01 to 2020-04-07
+    phase 2 -- 2020-04-08 to 2020-05-12
+    phase 3 -- 2020-05-13 to 2020-07-28
+    phase 4 -- 2020-07-29 to 2020-09-01
+
+covidPhases.json holds a list of phases with inclusive start and end dates:
+    [{"label": "phase 1", "start": "2020-03-01", "end": "2020-04-07"}, ...]
+
+A whole column of dates is labeled at once with a binary search of the phase
+start dates, and the labels are an ordered categorical. Dates outside every
+phase get no label.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+PHASE_FILE = 'covidPhases.json'
+
+DEFAULT_PHASES = [{'label': 'phase 1', 'start': '2020-03-01', 'end': '2020-04-07'},
+                  {'label': 'phase 2', 'start': '2020-04-08', 'end': '2020-05-12'},
+                  {'label': 'phase 3', 'start': '2020-05-13', 'end': '2020-07-28'},
+                  {'label': 'phase 4', 'start': '2020-07-29', 'end': '2020-09-01'}]
+
+
+def readPhases(phaseFile=PHASE_FILE):
+    '''Read the phases from a JSON file, or get the default phases if the file does not exist.
+
+    Return:
+    phases -- dataframe with label, start and end (datetime64) columns sorted by start
+
+    '''
+    if phaseFile is not None and os.path.exists(phaseFile):
+        with open(phaseFile) as f:
+            phaseList = json.load(f)
+    else:
+        phaseList = DEFAULT_PHASES
+
+    phases = pd.DataFrame(phaseList, columns=['label', 'start', 'end'])
+    phases['start'] = pd.to_datetime(phases['start'])
+    phases['end'] = pd.to_datetime(phases['end'])
+    phases = phases.sort_values('start').reset_index(drop=True)
+
+    if (phases['end'] < phases['start']).any() or (phases['start'].iloc[1:].values <= phases['end'].iloc[:-1].values).any():
+        raise ValueError('covid phases must not overlap and must end after they start: {}'.format(phaseFile))
+    return phases
+
+
+def phaseLabels(dates, phases=None):
+    '''Get the covid phase of each date.
+
+    Keyword arguments:
+    dates -- array-like of dates (datetime.date, datetime64 or date strings)
+    phases -- (optional) dataframe from readPhases, read if not given
+
+    Return:
+    labels -- ordered pandas Categorical of the phase labels, NaN outside the phases
+
+    '''
+    if phases is None:
+        phases = readPhases()
+
+    # Label each distinct date once, the token outputs repeat every date many times
+    codes, uniqueDates = pd.factorize(pd.Series(dates, dtype=object))
+    days = pd.to_datetime(pd.Series(uniqueDates, dtype=object)).dt.normalize().to_numpy()
+
+    starts = phases['start'].to_numpy()
+    ends = phases['end'].to_numpy()
+    phaseIndex = np.searchsorted(starts, days, side='right') - 1
+    inPhase = (phaseIndex >= 0) & (days <= ends[np.maximum(phaseIndex, 0)])
+    uniqueCodes = np.where(inPhase, phaseIndex, -1)
+
+    # Dates which pd.factorize could not read (NaN) get code -1 too
+    dateCodes = np.where(codes >= 0, uniqueCodes[np.maximum(codes, 0)] if len(uniqueCodes) else -1, -1)
+    categories = pd.CategoricalDtype(phases['label'], ordered=True)
+    return pd.Categorical.from_codes(dateCodes, dtype=categories)
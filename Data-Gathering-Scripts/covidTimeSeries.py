@@ -6,7 +6,14 @@ information from the data.
 Keyword arguments:
 covidFile -- the filepath for the Johns Hopkins time series data
 allTweetsFile -- the filepath for all the tweets before the are tokenized. 
-                This is needed to get the sentiment scores.
+                This is needed to get the sentiment scores. Can be allTweets.csv
+                or the allTweets_parquet store written by combineTweetCSVs.py
+chunksize -- (optional) the number of Tweets read at a time for the daily
+             sentiment, default 500000
+rollupFile -- (optional) csv of the daily sentiment sum and count. The path,
+              size and modification time of allTweetsFile are saved next to it
+              in <rollupFile>.source.json. It is read instead of the Tweets while
+              they still match, and rebuilt from the Tweets otherwise
 
 Output:
 covidTimeSeries.csv -- a csv file with date, number of confirmed cases,
@@ -20,44 +27,89 @@ SIADS 591 & 592 Milestone I
 Coronavirus Tweet Analysis Project
 '''
 
+import json
+import os
 import pandas as pd
 import sys
+import jhuTimeSeries
+import covidPhases
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-
-def main(covidFile, allTweetsFile):
-    
-    # Get the file
-    covid = pd.read_csv(covidFile)
-
-    # Get the names of the countries to make the column names
-    columns = list(covid['Country/Region'])
-
-    # Transpose the dataframe
-    covid = covid.transpose()
-
-    # Make the countries the column names, remove the rows don't need, and reindex the dataframe
-    covid.columns = columns
-    covid = covid[4:].reset_index()
-
-    # Rename the index column to date
-    covid.rename(columns={'index':'Date'}, inplace=True)
-
-    # Put the data in long form
-    covid = covid.melt(id_vars = ['Date'], ignore_index=True)
-
-    # Rename the columns
-    covid.rename(columns={'variable': 'Country', 'value': 'Confirmed'}, inplace=True)
-
-    # Change the date to datetime object to change date format in csv
-    covid['Date'] = pd.to_datetime(covid['Date'])
-
-    # Filter down to the necessary dates
-    covid = covid[(covid['Date'] >= '2020-03-01') & (covid['Date'] <= '2020-09-01')]
-    covid['Date'] = covid['Date'].dt.date
-
-    # Groupby date to get the total number of covid cases per day
-    covid = covid.groupby('Date').agg({'Confirmed':sum}).reset_index()
+import tweetStore
+
+def sourceSignature(path):
+    '''Get the full path, total size and latest modification time of a file, or of every file in a folder.'''
+    if os.path.isdir(path):
+        files = [os.path.join(root, name) for root, dirs, names in os.walk(path) for name in names]
+    else:
+        files = [path]
+    return {'path': os.path.abspath(path),
+            'size': sum(os.path.getsize(name) for name in files),
+            'modified': max([os.path.getmtime(name) for name in files] + [os.path.getmtime(path)])}
+
+
+def readSignature(rollupFile):
+    '''Read the source signature saved with a rollup file, None if there is none.'''
+    signatureFile = rollupFile + '.source.json'
+    if not os.path.exists(signatureFile):
+        return None
+    with open(signatureFile) as f:
+        return json.load(f)
+
+
+def dailySentiment(allTweetsFile, chunksize=500000, rollupFile=None, idFilter=None):
+    '''Get the sum and count of the sentiment scores for each day.
+
+    The Tweets are read a chunk at a time and added to running sums and counts
+    per day, so only one chunk and the daily totals are held in memory.
+
+    Keyword arguments:
+    allTweetsFile -- allTweets.csv or the allTweets_parquet store
+    chunksize -- the number of Tweets read at a time
+    rollupFile -- (optional) csv of the daily sums and counts, read instead of the
+        Tweets when the source signature saved with it matches allTweetsFile and
+        rebuilt when it does not
+    idFilter -- (optional) IdHashSet of the Tweet ids to skip, the ids read are added to it
+
+    Return:
+    sentiment -- dataframe with Date, sentimentSum and sentimentCount columns sorted by date
+
+    '''
+    signature = sourceSignature(allTweetsFile) if rollupFile is not None else None
+    if signature is not None and os.path.exists(rollupFile) and readSignature(rollupFile) == signature:
+        sentiment = pd.read_csv(rollupFile, float_precision='round_trip')
+        sentiment['Date'] = pd.to_datetime(sentiment['Date']).dt.date
+        return sentiment
+
+    sums = pd.Series(dtype='float64')
+    counts = pd.Series(dtype='int64')
+    # Only these two columns are read from the Parquet store
+    columns = ['timestamp', 'sentimentScore'] if idFilter is None else ['id', 'timestamp', 'sentimentScore']
+    for chunk in tweetStore.iterTweets(allTweetsFile, columns, chunksize=chunksize):
+        if idFilter is not None:
+            chunk = chunk[idFilter.addNew(chunk['id'].to_numpy())]
+        days = chunk.groupby(chunk['timestamp'].dt.date)['sentimentScore'].agg(['sum', 'count'])
+        sums = sums.add(days['sum'], fill_value=0)
+        counts = counts.add(days['count'], fill_value=0)
+
+    sentiment = pd.DataFrame({'sentimentSum': sums, 'sentimentCount': counts.astype('int64')}).sort_index()
+    sentiment = sentiment.rename_axis('Date').reset_index()
+
+    if rollupFile is not None:
+        # The signature is written last, so a rollup left half written does not match it
+        sentiment.to_csv(rollupFile + '.tmp', index=False)
+        os.replace(rollupFile + '.tmp', rollupFile)
+        with open(rollupFile + '.source.json', 'w') as f:
+            json.dump(signature, f)
+        print('{} created'.format(rollupFile))
+    return sentiment
+
+
+def caseMetrics(covid):
+    '''Add the new cases, their 7 day rolling average and its min-max scaled value to the daily cases.'''
+    # Nullable integers keep the counts whole numbers when the merge with the
+    # sentiment dates leaves some days without a count
+    covid['Confirmed'] = covid['Confirmed'].astype('Int64')
 
     # Get the total number of new cases each day
     covid['New Cases'] = np.abs(covid['Confirmed'].diff(-1))
@@ -69,16 +121,19 @@ def main(covidFile, allTweetsFile):
     avgConfirmedCases = covid['New Cases 7 Day Rolling Average'].values.reshape(-1,1)
     avgConfirmedCasesScaled = MinMaxScaler().fit_transform(avgConfirmedCases)
     covid['New Cases 7 Day Rolling Average (min-max scaled)'] = avgConfirmedCasesScaled
+    return covid
 
-    # Get the sentiment score
-    sentiment = pd.read_csv(allTweetsFile, usecols = ['timestamp', 'sentimentScore'])
-    
-    # Create a date column and filter down to date and sentiment score columns
-    sentiment['Date'] = pd.to_datetime(sentiment['timestamp']).dt.date
-    sentiment = sentiment[['Date', 'sentimentScore']]
 
+def sentimentMetrics(sentiment):
+    '''Get the average sentiment score per day, its 7 day rolling average and its min-max scaled value.
+
+    Keyword argument:
+    sentiment -- dataframe with Date, sentimentSum and sentimentCount columns, from dailySentiment
+
+    '''
     # Calculate the average sentiment score per day
-    sentiment = sentiment.groupby('Date').agg({'sentimentScore': np.mean}).reset_index()
+    sentiment['sentimentScore'] = sentiment['sentimentSum'] / sentiment['sentimentCount']
+    sentiment = sentiment[['Date', 'sentimentScore']]
 
     # Calculate the 7 day rolling average sentiment score
     sentiment['Sentiment 7 Day Rolling Average'] = sentiment['sentimentScore'].rolling(window=7).mean()
@@ -87,41 +142,36 @@ def main(covidFile, allTweetsFile):
     avgSentiment = sentiment['Sentiment 7 Day Rolling Average'].values.reshape(-1,1)
     avgSentimentScaled = MinMaxScaler().fit_transform(avgSentiment)
     sentiment['Sentiment 7 Day Rolling Average (min-max scaled)'] = avgSentimentScaled
+    return sentiment
+
 
+def mergeMetrics(covid, sentiment):
+    '''Merge the case and sentiment metrics on date and add the covid phase.'''
     # Merge the dataframes on date to add the sentiment score data
     covid = covid.merge(sentiment, how = 'outer', on='Date')
 
     # Rename columns
     covid.rename(columns = {'sentimentScore': 'Average Sentiment Score'}, inplace=True)
 
-    # Add what covid phase the count fell into
-    # Create a list of dates for each phase
-    phase1Dates = list(pd.date_range('2020-03-01', '2020-04-07', freq = 'D'))
-    phase2Dates = list(pd.date_range('2020-04-08', '2020-05-12', freq = 'D'))
-    phase3Dates = list(pd.date_range('2020-05-13', '2020-07-28', freq = 'D'))
-    phase4Dates = list(pd.date_range('2020-07-29', '2020-09-01', freq= 'D'))
+    # Add what covid phase the count fell into, the phases are set in covidPhases.py
+    covid['covid phase'] = covidPhases.phaseLabels(covid['Date'])
+    return covid
 
-    # Put the list of dates into one list
-    allDates = phase1Dates + phase2Dates + phase3Dates + phase4Dates
 
-    # Create lists with the phase labels
-    phase1 = ['phase 1'] * len(phase1Dates)
-    phase2 = ['phase 2'] * len(phase2Dates)
-    phase3 = ['phase 3'] * len(phase3Dates)
-    phase4 = ['phase 4'] * len(phase4Dates)
-
-    # Put the list of labels into one list
-    allPhases = phase1 + phase2 + phase3 + phase4
+def main(covidFile, allTweetsFile, chunksize=500000, rollupFile=None):
+    
+    # Get the total number of covid cases per day, the provinces and countries are
+    # summed in the wide JHU data and the result is cached for later runs
+    covid = caseMetrics(jhuTimeSeries.totalDailyCases(covidFile, '2020-03-01', '2020-09-01'))
 
-    # Create a dictionary with the phases and dates
-    phaseDict = dict(zip(allDates, allPhases))
+    # Get the daily sentiment score sums and counts, from the rollup file if it is up to date
+    sentiment = sentimentMetrics(dailySentiment(allTweetsFile, int(chunksize), rollupFile))
 
-    # Create the phase label column
-    covid['covid phase'] = covid['Date'].map(phaseDict)
+    covid = mergeMetrics(covid, sentiment)
 
     # Write the dataframe to a csv
     covid.to_csv('covidTimeSeries.csv', index=False)
     print('covidTimeSeries.csv created')
     print(covid.head())
 if __name__ == "__main__":
-    main(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    main(*sys.argv[1:])
\ No newline at end of file
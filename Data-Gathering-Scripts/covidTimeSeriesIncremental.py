@@ -0,0 +1,240 @@
+'''
+Updates covidTimeSeries.csv with new days of COVID data and new Tweets without
+recomputing the whole history.
+
+Only the rows whose metrics can change are recomputed: the new and changed days,
+the day before them (New Cases looks one day ahead) and the 6 days after them
+(the 7 day rolling averages look 6 days back). The min and max of each rolling
+average are kept in a state file. When the changed rows stay inside them only
+those rows are min-max scaled, and when a new extreme moves them every row is
+rescaled and the update says so.
+
+The state file also keeps the sentiment score sum and count of each day, and the
+ids of the Tweets already added are kept in <stateFile>.ids.npy, so the same
+Tweets can be passed again without being counted twice. The new output, ids and
+state are first written next to the old files and listed in <stateFile>.pending,
+and only then moved into place. A run interrupted while moving them is finished
+by the next run, so the ids are never saved without the sums of their Tweets.
+The first run (without a state file) builds everything from the Tweets given.
+Unlike covidTimeSeries.py there is no end date, every day from 2020-03-01 on is kept.
+
+Keyword arguments:
+covidFile -- the filepath for the Johns Hopkins time series data
+newTweetsFile -- the Tweets to add, a hydrated or combined Tweet csv or the
+                 allTweets_parquet store
+outputFile -- (optional) the time series csv to update, default covidTimeSeries.csv
+stateFile -- (optional) the state file, default covidTimeSeriesState.json
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import covidTimeSeries
+import idFilters
+import jhuTimeSeries
+import pendingFiles
+
+START_DATE = '2020-03-01'
+CASE_COLUMNS = ['Date', 'Confirmed', 'New Cases', 'New Cases 7 Day Rolling Average',
+                'New Cases 7 Day Rolling Average (min-max scaled)']
+SENTIMENT_COLUMNS = ['Date', 'sentimentScore', 'Sentiment 7 Day Rolling Average',
+                     'Sentiment 7 Day Rolling Average (min-max scaled)']
+
+
+def readState(stateFile):
+    '''Read the state file, None if there is none yet.'''
+    if not os.path.exists(stateFile):
+        return None
+    with open(stateFile) as f:
+        return json.load(f)
+
+
+def writeState(stateFile, state):
+    '''Write the state file next to the old file as <stateFile>.tmp.'''
+    with open(stateFile + '.tmp', 'w') as f:
+        json.dump(state, f)
+
+
+def minMaxScale(values, low, high):
+    '''Min-max scale values to 0-1 the same way MinMaxScaler does, NaN stays NaN.'''
+    dataRange = high - low
+    scale = 1.0 / (dataRange if dataRange != 0 else 1.0)
+    return values * scale + (0 - low * scale)
+
+
+def columnBounds(values):
+    '''Get the [min, max] of a column, None for a column with no values.'''
+    values = values.dropna()
+    return [float(values.min()), float(values.max())] if len(values) else None
+
+
+def rescale(frame, rawColumn, scaledColumn, affected, oldValues, bounds):
+    '''Min-max scale the changed rows, or every row when the min or max moved.
+
+    Keyword arguments:
+    frame -- dataframe with the raw and scaled columns
+    rawColumn -- the column which is scaled
+    scaledColumn -- the column the scaled values are written to
+    affected -- boolean mask of the rows whose raw values were recomputed
+    oldValues -- the raw values the affected rows had before, for the rows which existed
+    bounds -- the [min, max] of the raw column before the update, None if unknown
+
+    Return:
+    bounds -- the [min, max] of the raw column after the update
+    fullRescale -- True if every row was rescaled
+
+    '''
+    newValues = frame.loc[affected, rawColumn].dropna()
+    if bounds is None or oldValues.isin(bounds).any():
+        # The rows which held the old min or max changed, so look over the whole column
+        newBounds = columnBounds(frame[rawColumn])
+    elif len(newValues):
+        newBounds = [min(bounds[0], float(newValues.min())), max(bounds[1], float(newValues.max()))]
+    else:
+        newBounds = bounds
+
+    fullRescale = newBounds != bounds
+    if newBounds is None:
+        frame[scaledColumn] = np.nan
+    elif fullRescale:
+        frame[scaledColumn] = minMaxScale(frame[rawColumn].astype('float64'), *newBounds)
+    else:
+        frame.loc[affected, scaledColumn] = minMaxScale(frame.loc[affected, rawColumn].astype('float64'), *newBounds)
+    return newBounds, fullRescale
+
+
+def firstChange(old, new, column):
+    '''Get the position in new of the first row which is new or whose column value changed.'''
+    merged = new[['Date', column]].merge(old[['Date', column]], on='Date', how='left', suffixes=('', ' old'))
+    changed = merged[column].astype('float64').to_numpy() != merged[column + ' old'].astype('float64').to_numpy()
+    both = merged[[column, column + ' old']].isna().all(axis=1).to_numpy()
+    positions = np.flatnonzero(changed & ~both)
+    return int(positions[0]) if len(positions) else None
+
+
+def updateCases(oldCases, newCases, bounds):
+    '''Recompute the case metrics of the rows affected by new or changed daily counts.
+
+    Return:
+    cases -- dataframe of the CASE_COLUMNS for every day
+    bounds -- the [min, max] of the rolling average
+    fullRescale -- True if every row was rescaled
+
+    '''
+    newCases['Confirmed'] = newCases['Confirmed'].astype('Int64')
+    if oldCases is None or len(oldCases) == 0 or not oldCases['Date'].isin(newCases['Date']).all():
+        cases = covidTimeSeries.caseMetrics(newCases)
+        return cases[CASE_COLUMNS], columnBounds(cases['New Cases 7 Day Rolling Average']), True
+
+    first = firstChange(oldCases, newCases, 'Confirmed')
+    cases = newCases.merge(oldCases.drop(columns='Confirmed'), on='Date', how='left')
+    if first is None:
+        return cases[CASE_COLUMNS], bounds, False
+
+    # New Cases looks one day ahead so the day before the first change changes too,
+    # and the rolling average needs the 6 days before that
+    start = max(first - 1, 0)
+    cases['New Cases'] = cases['New Cases'].astype('Int64')
+    cases.loc[start:, 'New Cases'] = np.abs(cases['Confirmed'].iloc[start:].diff(-1))
+    window = cases['New Cases'].iloc[max(start - 6, 0):].rolling(window=7).mean().round()
+    cases.loc[start:, 'New Cases 7 Day Rolling Average'] = window.loc[start:]
+
+    affected = cases.index >= start
+    oldValues = oldCases['New Cases 7 Day Rolling Average'][oldCases['Date'].isin(cases.loc[affected, 'Date'])]
+    bounds, fullRescale = rescale(cases, 'New Cases 7 Day Rolling Average',
+                                  'New Cases 7 Day Rolling Average (min-max scaled)', affected, oldValues, bounds)
+    return cases[CASE_COLUMNS], bounds, fullRescale
+
+
+def updateSentiment(oldSentiment, days, changedDates, bounds):
+    '''Recompute the sentiment metrics of the rows affected by changed daily sums and counts.
+
+    Keyword arguments:
+    oldSentiment -- dataframe of the SENTIMENT_COLUMNS from the last update, None on the first
+    days -- dataframe with Date, sentimentSum and sentimentCount for every day
+    changedDates -- the dates whose sums and counts changed
+    bounds -- the [min, max] of the rolling average from the last update
+
+    '''
+    days = days.sort_values('Date').reset_index(drop=True)
+    if oldSentiment is None or len(oldSentiment) == 0:
+        sentiment = covidTimeSeries.sentimentMetrics(days)
+        return sentiment[SENTIMENT_COLUMNS], columnBounds(sentiment['Sentiment 7 Day Rolling Average']), True
+
+    sentiment = days[['Date']].merge(oldSentiment, on='Date', how='left')
+    sentiment['sentimentScore'] = (days['sentimentSum'] / days['sentimentCount']).to_numpy()
+    positions = np.flatnonzero(sentiment['Date'].isin(changedDates).to_numpy())
+    if len(positions) == 0:
+        return sentiment[SENTIMENT_COLUMNS], bounds, False
+
+    # A changed day changes its own rolling average and those of the 6 days after it
+    affected = np.zeros(len(sentiment), dtype=bool)
+    for position in positions:
+        affected[position:position + 7] = True
+    start = int(positions[0])
+    window = sentiment['sentimentScore'].iloc[max(start - 6, 0):].rolling(window=7).mean()
+    sentiment.loc[affected, 'Sentiment 7 Day Rolling Average'] = window[affected[max(start - 6, 0):]]
+
+    oldValues = oldSentiment['Sentiment 7 Day Rolling Average'][oldSentiment['Date'].isin(sentiment.loc[affected, 'Date'])]
+    bounds, fullRescale = rescale(sentiment, 'Sentiment 7 Day Rolling Average',
+                                  'Sentiment 7 Day Rolling Average (min-max scaled)', affected, oldValues, bounds)
+    return sentiment[SENTIMENT_COLUMNS], bounds, fullRescale
+
+
+def readOutput(outputFile):
+    '''Split the last time series csv into its case and sentiment rows.'''
+    if not os.path.exists(outputFile):
+        return None, None
+    output = pd.read_csv(outputFile, float_precision='round_trip')
+    output['Date'] = pd.to_datetime(output['Date']).dt.date
+    output.rename(columns={'Average Sentiment Score': 'sentimentScore'}, inplace=True)
+    cases = output.loc[output['Confirmed'].notna(), CASE_COLUMNS].reset_index(drop=True)
+    sentiment = output.loc[output['sentimentScore'].notna() | output['Sentiment 7 Day Rolling Average'].notna(),
+                           SENTIMENT_COLUMNS].reset_index(drop=True)
+    return cases, sentiment
+
+
+def main(covidFile, newTweetsFile, outputFile='covidTimeSeries.csv', stateFile='covidTimeSeriesState.json'):
+    pendingFiles.finishPending(stateFile + '.pending')
+    state = readState(stateFile)
+    oldCases, oldSentiment = readOutput(outputFile) if state is not None else (None, None)
+    state = state or {'cases': None, 'sentiment': None, 'days': {}}
+
+    # Add the sentiment of the Tweets which have not been added before to the daily sums and counts
+    idFile = stateFile + '.ids.npy'
+    idFilter = idFilters.IdHashSet.load(idFile) if os.path.exists(idFile) else idFilters.IdHashSet()
+    newDays = covidTimeSeries.dailySentiment(newTweetsFile, idFilter=idFilter)
+    for date, total, count in zip(newDays['Date'], newDays['sentimentSum'], newDays['sentimentCount']):
+        oldTotal, oldCount = state['days'].get(str(date), (0.0, 0))
+        state['days'][str(date)] = (oldTotal + float(total), oldCount + int(count))
+    days = pd.DataFrame([(pd.Timestamp(date).date(), total, count) for date, (total, count) in state['days'].items()],
+                        columns=['Date', 'sentimentSum', 'sentimentCount'])
+
+    cases, state['cases'], casesRescaled = updateCases(
+        oldCases, jhuTimeSeries.totalDailyCases(covidFile, START_DATE), state['cases'])
+    sentiment, state['sentiment'], sentimentRescaled = updateSentiment(
+        oldSentiment, days, set(newDays['Date']), state['sentiment'])
+    if casesRescaled:
+        print('New cases rolling average min or max changed, every row was rescaled')
+    if sentimentRescaled:
+        print('Sentiment rolling average min or max changed, every row was rescaled')
+
+    covid = covidTimeSeries.mergeMetrics(cases, sentiment)
+    # The output, the counted ids and the state are moved into place together
+    covid.to_csv(outputFile + '.tmp', index=False)
+    idFilter.save(idFile + '.tmp')
+    writeState(stateFile, state)
+    pendingFiles.commitPending(stateFile + '.pending', [outputFile, idFile, stateFile])
+
+    print('{} updated with {} new Tweets'.format(outputFile, int(newDays['sentimentCount'].sum())))
+    print(covid.tail())
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,126 @@
+'''
+A local stand-in for the Twitter statuses/lookup endpoint used to test the
+hydration scripts without spending any rate limit.
+
+Every Tweet id divisible by 7 is treated as deleted and left out of the
+response, every third Tweet is a Retweet. Responses carry the same
+x-rate-limit-* headers as Twitter and a 429 is returned once the limit for
+the current window is used up. Authentication is not checked.
+
+Keyword arguments:
+port -- the port to listen on (default 8000)
+limit -- number of lookups allowed per window (default 900)
+window -- length of the rate limit window in seconds (default 900)
+latency -- seconds to wait before answering each lookup (default 0.2)
+
+Usage:
+    python fakeTwitterApi.py 8000
+    python twitterAPIScript.py sampled_tweetids.csv 0 10000 8 http://localhost:8000
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def fakeTweet(tweetId):
+    '''Build the json for a fake Tweet with the fields parseTweet uses.
+
+    Keyword argument:
+    tweetId -- the id of the Tweet
+
+    Return:
+    tweet -- dictionary in the format returned by statuses/lookup
+
+    '''
+    createdAt = datetime(2020, 3, 1) + timedelta(seconds=tweetId % (200 * 24 * 3600))
+    tweet = {
+        'id': tweetId,
+        'id_str': str(tweetId),
+        'created_at': createdAt.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+        'full_text': 'Tweet {} about the #coronavirus https://t.co/fake'.format(tweetId),
+        'lang': 'en',
+        'user': {'id': tweetId % 1000, 'location': 'Ann Arbor, MI'},
+        'entities': {'hashtags': [{'text': 'coronavirus'}]},
+    }
+    if tweetId % 3 == 0:
+        tweet['retweeted_status'] = dict(tweet, full_text='Original tweet for {}'.format(tweetId))
+    return tweet
+
+
+class RateLimit:
+    '''Tracks the lookups used in the current window.'''
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.used = 0
+        self.resetAt = time.time() + window
+        self.lock = threading.Lock()
+
+    def take(self):
+        '''Use one lookup. Returns the remaining count and reset time, or a remaining count of -1 if none are left.'''
+        with self.lock:
+            now = time.time()
+            if now >= self.resetAt:
+                self.used = 0
+                self.resetAt = now + self.window
+            if self.used >= self.limit:
+                return -1, int(self.resetAt)
+            self.used += 1
+            return self.limit - self.used, int(self.resetAt)
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    '''Answers GET requests to /1.1/statuses/lookup.json.'''
+    rateLimit = None
+    latency = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/1.1/statuses/lookup.json':
+            self.reply(404, {'errors': [{'message': 'Sorry, that page does not exist', 'code': 34}]})
+            return
+
+        remaining, resetAt = self.rateLimit.take()
+        headers = {'x-rate-limit-limit': self.rateLimit.limit,
+                   'x-rate-limit-remaining': max(remaining, 0),
+                   'x-rate-limit-reset': resetAt}
+        if remaining < 0:
+            self.reply(429, {'errors': [{'message': 'Rate limit exceeded', 'code': 88}]}, headers)
+            return
+
+        time.sleep(self.latency)
+        ids = [int(tweetId) for tweetId in parse_qs(url.query).get('id', [''])[0].split(',') if tweetId]
+        self.reply(200, [fakeTweet(tweetId) for tweetId in ids if tweetId % 7 != 0], headers)
+
+    def reply(self, status, body, headers=None):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(port=8000, limit=900, window=900, latency=0.2):
+    LookupHandler.rateLimit = RateLimit(int(limit), float(window))
+    LookupHandler.latency = float(latency)
+    server = ThreadingHTTPServer(('localhost', int(port)), LookupHandler)
+    print('Fake Twitter API listening on http://localhost:{}'.format(port))
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
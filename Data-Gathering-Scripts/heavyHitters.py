@@ -0,0 +1,156 @@
+'''
+Finds the most used words and n-grams for each day and each covid phase in
+fixed memory, for n-gram sizes whose exact count tables would be too large.
+
+Each day and each phase keeps a heavy hitter summary of at most capacity
+n-grams. The Tweets are read in chunks, each chunk's n-grams are counted
+exactly, and the chunk counts are merged into the summaries, so memory depends
+on the chunk size and the capacity and not on the size of the corpus. No Tweet
+ids are kept, combineTweetCSVs.py already drops the duplicates.
+
+The summary is the mergeable Misra-Gries summary, which is the same as a
+Space-Saving summary with counts lowered by its error. For every n-gram
+    lowerCount <= true count <= upperCount = lowerCount + error
+where the error is the same for all n-grams of a summary and is at most
+the total count / (capacity + 1). Any n-gram which is not in the summary was
+used at most error times. An n-gram is marked guaranteed when its lowerCount is
+at least the upperCount of every n-gram ranked below the top k, so it is sure
+to be in the true top k.
+
+Keyword arguments:
+tweetFile -- the file which contains all the Tweets, either allTweets.csv or the
+             allTweets_parquet store written by combineTweetCSVs.py
+ngramSizes -- (optional) comma separated n-gram sizes to count, default 1,2,3,4
+capacity -- (optional) the number of n-grams kept in each summary, default 2000
+topK -- (optional) the number of n-grams written for each day and phase, default 100
+chunksize -- (optional) the number of Tweets read at a time, default 200000
+workers -- (optional) the number of processes to tokenize with, default 1
+
+Output:
+heavyHitters_<name>.csv -- for each n-gram size, e.g. heavyHitters_tokenizedTweets_3gram.csv,
+    the top k n-grams for each date and each covid phase with the columns
+    period, date or phase, tokenized, counts (upperCount), lowerCount, error, guaranteed
+
+If you have not installed the below packages they must be installed
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import heapq
+import os
+import sys
+from collections import Counter, defaultdict
+import pandas as pd
+import tweetNgramPipeline
+import covidPhases
+
+
+class HeavyHitters:
+    '''Mergeable Misra-Gries summary keeping at most capacity items.
+
+    Keyword argument:
+    capacity -- the most items kept, the error is at most total / (capacity + 1)
+
+    '''
+    def __init__(self, capacity=2000):
+        self.capacity = capacity
+        self.counts = {}
+        self.error = 0
+        self.total = 0
+
+    def merge(self, counter):
+        '''Add a Counter of exact item counts to the summary.'''
+        counts = self.counts
+        for item, count in counter.items():
+            counts[item] = counts.get(item, 0) + count
+        self.total += sum(counter.values())
+
+        if len(counts) > self.capacity:
+            # Lower every count by the (capacity + 1)th largest count and drop
+            # the items left with nothing, which leaves at most capacity items
+            cut = heapq.nlargest(self.capacity + 1, counts.values())[-1]
+            self.counts = {item: count - cut for item, count in counts.items() if count > cut}
+            self.error += cut
+
+    def top(self, k):
+        '''Get the k items with the largest counts.
+
+        Return:
+        rows -- list of (item, upperCount, lowerCount, guaranteed) tuples, largest first
+
+        '''
+        ranked = sorted(self.counts.items(), key=lambda itemCount: (-itemCount[1], itemCount[0]))
+        # The most any n-gram outside the top k could have been used
+        threshold = (ranked[k][1] if len(ranked) > k else 0) + self.error
+        return [(item, count + self.error, count, count >= threshold) for item, count in ranked[:k]]
+
+
+def updateSummaries(summaries, counter, dateKeys, capacity):
+    '''Merge a chunk's Counter of (date, n-gram) -> count into the summary for each key.
+
+    dateKeys is a dictionary of each date to the key (the date or its phase) it is
+    summarized under, dates with a None key are left out.
+
+    '''
+    byKey = defaultdict(Counter)
+    for (date, gram), count in counter.items():
+        key = dateKeys[date]
+        if key is not None:
+            byKey[key][gram] += count
+
+    for key, keyCounter in byKey.items():
+        if key not in summaries:
+            summaries[key] = HeavyHitters(capacity)
+        summaries[key].merge(keyCounter)
+
+
+def summaryRows(summaries, period, topK):
+    '''Create the rows of the top k n-grams of each summary.'''
+    rows = []
+    for key in sorted(summaries):
+        summary = summaries[key]
+        for gram, upperCount, lowerCount, guaranteed in summary.top(topK):
+            rows.append((period, str(key), gram, upperCount, lowerCount, summary.error, guaranteed))
+    return rows
+
+
+def main(tweetFile, ngramSizes='1,2,3,4', capacity=2000, topK=100, chunksize=200000, workers=1):
+    outputs = [tweetNgramPipeline.ngramOutput(n) for n in str(ngramSizes).split(',')]
+    capacity = int(capacity)
+    topK = int(topK)
+
+    phases = covidPhases.readPhases()
+
+    daySummaries = [{} for output in outputs]
+    phaseSummaries = [{} for output in outputs]
+    # No id filter, the ids would grow with the corpus and combineTweetCSVs already dropped
+    # the duplicates, so the summaries are the only state kept between chunks
+    for partial in tweetNgramPipeline.chunkCounts(tweetFile, outputs, workers=int(workers),
+                                                  chunksize=int(chunksize), idFilter=None):
+        dates = sorted({date for counter in partial for date, gram in counter})
+        dayKeys = {date: date for date in dates}
+        phaseKeys = {date: None if pd.isna(label) else label
+                     for date, label in zip(dates, covidPhases.phaseLabels(dates, phases))}
+
+        for counter, dayHitters, phaseHitters in zip(partial, daySummaries, phaseSummaries):
+            updateSummaries(dayHitters, counter, dayKeys, capacity)
+            updateSummaries(phaseHitters, counter, phaseKeys, capacity)
+
+    for output, dayHitters, phaseHitters in zip(outputs, daySummaries, phaseSummaries):
+        rows = summaryRows(dayHitters, 'date', topK) + summaryRows(phaseHitters, 'phase', topK)
+        hitters = pd.DataFrame(rows, columns=['period', 'date or phase', 'tokenized', 'counts',
+                                              'lowerCount', 'error', 'guaranteed'])
+        fileName = 'heavyHitters_' + os.path.basename(output.fileName)
+        hitters.to_csv(fileName, index=False)
+
+        maxError = max([summary.error for summary in list(dayHitters.values()) + list(phaseHitters.values())] or [0])
+        print('{} created, largest count error {}'.format(fileName, maxError))
+        print(hitters.head())
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
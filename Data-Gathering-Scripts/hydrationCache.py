@@ -0,0 +1,88 @@
+'''
+A persistent cache of hydrated Tweets kept in a local SQLite database.
+
+Maps each Tweet id to the fields parseTweet returns. Tweet ids which the API
+did not return (deleted, protected or suspended Tweets) are stored as missing
+so they are not looked up again either. twitterAPIScript checks the cache
+before every lookup and only sends the ids which are not in it to the API.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import sqlite3
+
+
+class HydrationCache:
+    '''Stores hydrated Tweets by Tweet id.
+
+    Keyword argument:
+    cacheFile -- filepath of the SQLite database, created if it does not exist
+
+    '''
+    def __init__(self, cacheFile='hydrationCache.db'):
+        self.connection = sqlite3.connect(cacheFile)
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS tweets (
+            id INTEGER PRIMARY KEY,
+            found INTEGER NOT NULL,
+            timestamp TEXT,
+            text TEXT,
+            hashtag TEXT,
+            location TEXT,
+            lang TEXT,
+            status TEXT)''')
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tweetIds):
+        '''Get the cached Tweets for a group of Tweet ids.
+
+        Keyword argument:
+        tweetIds -- list of tweet ids
+
+        Return:
+        cached -- dictionary with the tweet id as the key and the tuple
+            (idVal, timestamp, text, hashtags, location, lang, status) as the value,
+            or None for a Tweet which is known to be missing
+
+        '''
+        cached = {}
+        # Stay under SQLite's limit on the number of query parameters
+        for i in range(0, len(tweetIds), 500):
+            group = [int(tweetId) for tweetId in tweetIds[i:i + 500]]
+            rows = self.connection.execute(
+                'SELECT id, found, timestamp, text, hashtag, location, lang, status FROM tweets WHERE id IN ({})'
+                .format(','.join('?' * len(group))), group)
+            for row in rows:
+                cached[row[0]] = (row[0],) + row[2:] if row[1] else None
+
+        self.hits += len(cached)
+        self.misses += len(tweetIds) - len(cached)
+        return cached
+
+    def put(self, tweets, missingIds):
+        '''Add newly hydrated Tweets and the ids the API did not return.
+
+        Keyword arguments:
+        tweets -- list of (idVal, timestamp, text, hashtags, location, lang, status) tuples
+        missingIds -- list of tweet ids which the API did not return
+
+        '''
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO tweets VALUES (?, 1, ?, ?, ?, ?, ?, ?)',
+            [(int(tweet[0]), str(tweet[1])) + tuple(tweet[2:]) for tweet in tweets])
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO tweets (id, found) VALUES (?, 0)',
+            [(int(tweetId),) for tweetId in missingIds])
+        self.connection.commit()
+
+    def report(self):
+        '''Return a summary of the cache hits and misses so far.'''
+        total = self.hits + self.misses
+        hitRate = self.hits / total if total else 0
+        return 'Cache hits: {} misses: {} ({:.1%} hit rate)'.format(self.hits, self.misses, hitRate)
+
+    def close(self):
+        self.connection.close()
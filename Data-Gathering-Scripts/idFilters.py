@@ -0,0 +1,196 @@
+'''
+Filters which remember the Tweet ids already seen so duplicate Tweets can be
+dropped while streaming through the data.
+
+IdHashSet -- exact. An open addressing hash table of int64 ids held in one numpy
+    array (8 bytes per slot), filled a chunk of ids at a time. It can be saved
+    and loaded to remember the ids seen from one run to the next.
+IdBloomFilter -- approximate, for corpora too large for an exact set. Uses a
+    fixed number of bits per id. A small fraction (errorRate) of new ids are
+    wrongly reported as seen and dropped, seen ids are never reported as new.
+
+Both have addNew(ids) which returns a boolean mask that is True for the first
+time each id is seen, and count the duplicates they have filtered.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import math
+import os
+import numpy as np
+import pandas as pd
+
+
+def mixIds(ids):
+    '''Scramble int64 ids into well spread uint64 hashes (splitmix64 finalizer).'''
+    x = np.asarray(ids, dtype=np.int64).view(np.uint64)
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def firstInChunk(ids):
+    '''Mask which is True for the first occurrence of each id within the chunk.'''
+    return ~pd.Series(ids).duplicated().to_numpy()
+
+
+class IdHashSet:
+    '''Exact set of int64 Tweet ids stored in a numpy open addressing table.
+
+    Keyword argument:
+    capacity -- initial number of slots, rounded up to a power of 2. The table
+        doubles whenever it becomes half full.
+
+    '''
+    EMPTY = np.iinfo(np.int64).min # Tweet ids are never negative
+
+    def __init__(self, capacity=1 << 20):
+        capacity = 1 << max(int(capacity) - 1, 1).bit_length()
+        self.table = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.size = 0
+        self.duplicates = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, keys):
+        '''Insert unique keys, returning a mask which is True for the keys which were not in the table.'''
+        table = self.table
+        mask = np.uint64(len(table) - 1)
+        slots = (mixIds(keys) & mask).astype(np.int64)
+        inserted = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+
+        # Linear probing, one probe step for all the pending keys at a time
+        while len(pending):
+            pendingSlots = slots[pending]
+            current = table[pendingSlots]
+            present = current == keys[pending]
+            empty = current == self.EMPTY
+
+            # Claim the empty slots, when several keys want the same slot one of them wins
+            claimers = pending[empty]
+            table[slots[claimers]] = keys[claimers]
+            won = np.zeros(len(pending), dtype=bool)
+            won[empty] = table[slots[claimers]] == keys[claimers]
+            inserted[pending[won]] = True
+
+            # Keys which lost a claim or hit another key move on to the next slot
+            pending = pending[~(present | won)]
+            slots[pending] = (slots[pending] + 1) & (len(table) - 1)
+
+        self.size += int(inserted.sum())
+        return inserted
+
+    def grow(self, needed):
+        '''Double the table until needed keys fit at under half full.'''
+        capacity = len(self.table)
+        while needed * 2 > capacity:
+            capacity *= 2
+        if capacity == len(self.table):
+            return
+        keys = self.table[self.table != self.EMPTY]
+        self.table = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.size = 0
+        self.insert(keys)
+
+    def addNew(self, ids):
+        '''Add a chunk of ids.
+
+        Keyword argument:
+        ids -- array of int64 tweet ids
+
+        Return:
+        isNew -- boolean mask, True where the id has not been seen before
+
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        isNew = firstInChunk(ids)
+        candidates = np.flatnonzero(isNew)
+        self.grow(self.size + len(candidates))
+        isNew[candidates] = self.insert(ids[candidates])
+        self.duplicates += len(ids) - int(isNew.sum())
+        return isNew
+
+    def save(self, path):
+        '''Save the table to a .npy file, replacing any earlier file only once it is written.'''
+        tempPath = path + '.tmp'
+        with open(tempPath, 'wb') as tempFile:
+            np.save(tempFile, self.table)
+        os.replace(tempPath, path)
+
+    @classmethod
+    def load(cls, path):
+        '''Load a table saved by save.'''
+        idSet = cls(capacity=1)
+        idSet.table = np.load(path)
+        idSet.size = int((idSet.table != cls.EMPTY).sum())
+        return idSet
+
+
+class IdBloomFilter:
+    '''Approximate set of int64 Tweet ids in a fixed size bit array.
+
+    Keyword arguments:
+    capacity -- the number of distinct ids expected
+    errorRate -- the chance a new id is wrongly reported as seen once capacity ids are in the filter
+
+    '''
+    def __init__(self, capacity=100000000, errorRate=0.001):
+        self.numBits = int(math.ceil(-capacity * math.log(errorRate) / math.log(2) ** 2))
+        self.numHashes = max(1, int(round(self.numBits / capacity * math.log(2))))
+        self.bits = np.zeros((self.numBits + 7) // 8, dtype=np.uint8)
+        self.duplicates = 0
+
+    def positions(self, ids):
+        '''Bit positions for each id, one column per hash function (double hashing).'''
+        h1 = mixIds(ids)
+        h2 = mixIds((h1 ^ np.uint64(0x9e3779b97f4a7c15)).view(np.int64)) | np.uint64(1)
+        steps = np.arange(self.numHashes, dtype=np.uint64)
+        return (h1[:, None] + steps * h2[:, None]) % np.uint64(self.numBits)
+
+    def addNew(self, ids):
+        '''Add a chunk of ids.
+
+        Keyword argument:
+        ids -- array of int64 tweet ids
+
+        Return:
+        isNew -- boolean mask, True where the id has (probably) not been seen before
+
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        isNew = firstInChunk(ids)
+        candidates = np.flatnonzero(isNew)
+
+        positions = self.positions(ids[candidates])
+        byte = (positions >> np.uint64(3)).astype(np.int64)
+        bit = (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        seen = ((self.bits[byte] & bit) != 0).all(axis=1)
+        isNew[candidates[seen]] = False
+
+        np.bitwise_or.at(self.bits, byte[~seen].ravel(), bit[~seen].ravel())
+        self.duplicates += len(ids) - int(isNew.sum())
+        return isNew
+
+
+def makeIdFilter(dedup, capacity=None):
+    '''Create the filter for a dedup mode.
+
+    Keyword arguments:
+    dedup -- "exact", "bloom" or "none"
+    capacity -- (optional) expected number of distinct ids, used to size the Bloom filter
+
+    Return:
+    idFilter -- an IdHashSet, an IdBloomFilter or None
+
+    '''
+    if dedup == 'exact':
+        return IdHashSet()
+    if dedup == 'bloom':
+        return IdBloomFilter(capacity) if capacity else IdBloomFilter()
+    return None
@@ -0,0 +1,100 @@
+'''
+Loads the Johns Hopkins COVID time series data for the COVID scripts.
+
+The JHU file has one row per province or country and one column per date. The
+provinces are summed per country while the data is still in this wide, numeric
+form, and the date columns are parsed once. The result (one row per country,
+one int64 column per date) is cached in a pickle named after a hash of the JHU
+file, so later runs on the same file only read the cache.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import hashlib
+import os
+import pandas as pd
+
+
+def fileHash(path):
+    '''Get the sha256 hash of a file.'''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def readCountryCases(covidFile, cacheDirectory='jhuCache'):
+    '''Read the JHU time series with the provinces summed per country.
+
+    Keyword arguments:
+    covidFile -- the filepath for the Johns Hopkins time series data
+    cacheDirectory -- the folder for the cached results, None to not cache
+
+    Return:
+    countryCases -- dataframe with a row per country (index Country) and an int64
+        column of confirmed cases per date (datetime64 column labels)
+
+    '''
+    cacheFile = None
+    if cacheDirectory is not None:
+        baseName = os.path.splitext(os.path.basename(covidFile))[0]
+        cacheFile = os.path.join(cacheDirectory, '{}_{}.pkl'.format(baseName, fileHash(covidFile)[:16]))
+        if os.path.exists(cacheFile):
+            return pd.read_pickle(cacheFile)
+
+    covid = pd.read_csv(covidFile)
+
+    # The first four columns are Province/State, Country/Region, Lat and Long, the rest are dates
+    dateColumns = covid.columns[4:]
+    countryCases = covid.groupby('Country/Region')[list(dateColumns)].sum()
+    countryCases.columns = pd.to_datetime(dateColumns, format='%m/%d/%y')
+    countryCases.index.name = 'Country'
+
+    if cacheFile is not None:
+        os.makedirs(cacheDirectory, exist_ok=True)
+        countryCases.to_pickle(cacheFile + '.tmp')
+        os.replace(cacheFile + '.tmp', cacheFile)
+
+    return countryCases
+
+
+def dateRange(countryCases, startDate=None, endDate=None):
+    '''Keep the date columns from startDate to endDate, inclusive.'''
+    dates = countryCases.columns
+    keep = pd.Series(True, index=dates)
+    if startDate is not None:
+        keep &= dates >= pd.Timestamp(startDate)
+    if endDate is not None:
+        keep &= dates <= pd.Timestamp(endDate)
+    return countryCases.loc[:, keep.to_numpy()]
+
+
+def countryDailyCases(covidFile, startDate=None, endDate=None, cacheDirectory='jhuCache'):
+    '''Get the confirmed cases for each country and day in long form.
+
+    Return:
+    covid -- dataframe with Date (datetime.date), Country and Confirmed columns,
+        sorted by date and country
+
+    '''
+    countryCases = dateRange(readCountryCases(covidFile, cacheDirectory), startDate, endDate)
+    covid = countryCases.T.stack().rename('Confirmed').reset_index()
+    covid.columns = ['Date', 'Country', 'Confirmed']
+    covid['Date'] = covid['Date'].dt.date
+    return covid
+
+
+def totalDailyCases(covidFile, startDate=None, endDate=None, cacheDirectory='jhuCache'):
+    '''Get the total confirmed cases over all the countries for each day.
+
+    Return:
+    covid -- dataframe with Date (datetime.date) and Confirmed columns, sorted by date
+
+    '''
+    countryCases = dateRange(readCountryCases(covidFile, cacheDirectory), startDate, endDate)
+    covid = countryCases.sum().rename('Confirmed').rename_axis('Date').reset_index()
+    covid['Date'] = covid['Date'].dt.date
+    return covid
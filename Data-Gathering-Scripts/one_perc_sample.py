@@ -4,13 +4,38 @@ specifically searching for .csv files and then take a 1%
 of each of those files and append them onto a final dataframe
 which will in turn be writone to .csv
 
+Two sampling modes are available:
+    memory -- (default) reads each daily file fully and takes
+              an exact 1% sample with df.sample
+    stream -- reads each daily file in chunks and keeps each row
+              with probability 1% (Bernoulli sample), writing the
+              sampled rows to sampled_tweetids.csv as it goes so peak
+              memory depends on the chunk and sample size only
+    hash   -- keeps a tweet when a hash of its tweet_id falls in the
+              lowest 1% of the hash space. The sample no longer depends
+              on row order, so repeated runs give the same sample. Daily
+              files already listed in sampled_manifest.json are skipped
+              and samples of new files are appended to
+              sampled_tweetids.csv, making daily runs O(new data)
+
+Any mode can sample the daily files in parallel by passing the
+number of worker processes. The files are always processed in sorted
+order so the parallel output is identical to the serial output.
+
+Usage:
+    python one_perc_sample.py [memory|stream|hash] [workers]
+
 Ian Byrne, Laura Stagnaro
 SIADS 591&592 Milestone I
 Coronavirus Tweet Analysis Project
 '''
 
 import pandas as pd
+import numpy as np
 import os
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
 
 
 def one_perc_sample(df):
@@ -20,31 +45,219 @@ def one_perc_sample(df):
     return data_sample
 
 
-def combined_samples():
+def stream_sample(path, frac=.01, random_state=52, chunksize=1000000):
+    '''
+    reads the file at path in chunks and yields a Bernoulli
+    sample of each chunk, keeping every row with probability frac.
+    The random state is reset for every file so each daily
+    sample is reproducible on its own.
+    '''
+
+    rng = np.random.RandomState(random_state)
+    reader = pd.read_csv(path, header=None, names=['tweet_id', 'sentiment_score'],
+                         chunksize=chunksize)
+
+    for chunk in reader:
+        yield chunk[rng.random_sample(len(chunk)) < frac]
+
+
+def hash_sample(path, frac=.01, chunksize=1000000):
+    '''
+    reads the file at path in chunks and yields the rows whose
+    hashed tweet_id falls under frac of the 64 bit hash space.
+    The hash is deterministic so a tweet is always either in
+    or out of the sample regardless of which file it is in.
+    '''
+
+    threshold = np.uint64(frac * 2**64)
+    reader = pd.read_csv(path, header=None, names=['tweet_id', 'sentiment_score'],
+                         chunksize=chunksize)
+
+    for chunk in reader:
+        hashed = pd.util.hash_pandas_object(chunk['tweet_id'], index=False).values
+        yield chunk[hashed < threshold]
+
+
+def csv_files(directory):
+    '''lists the .csv files in the directory in sorted order'''
+
+    return sorted(filename for filename in os.listdir(directory)
+                  if filename.endswith(".csv"))
+
+
+def sample_file(path, mode='memory'):
+    '''
+    takes the 1% sample of a single daily file. Used directly
+    by the serial run and as the task run by each worker process.
+    '''
+
+    if mode == 'stream':
+        return pd.concat(stream_sample(path))
+
+    if mode == 'hash':
+        return pd.concat(hash_sample(path))
+
+    return one_perc_sample(pd.read_csv(path, header=None,
+                                       names=['tweet_id', 'sentiment_score']))
+
+
+def sampled_days(directory, mode='memory', workers=1, filenames=None):
+    '''
+    yields (filename, sample) for every .csv file in the directory
+    (or only the given filenames) in sorted order, spreading the
+    files over a pool of worker processes when workers is more than 1
+    '''
+
+    if filenames is None:
+        filenames = csv_files(directory)
+    paths = [directory + filename for filename in filenames]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map returns the results in the order the files were submitted
+            samples = executor.map(sample_file, paths, [mode] * len(paths))
+            for filename, day_sample in zip(filenames, samples):
+                yield filename, day_sample
+    else:
+        for filename, path in zip(filenames, paths):
+            yield filename, sample_file(path, mode)
+
+
+def combined_samples(workers=1):
     '''
     lists through all .csv files in ieee_data folder
     creating a dataframe then takes 1% sample of it
-    then appends the sample to the final df
+    then combines the samples into the final df
     '''
 
     directory = 'ieee_data/'
-    final_sample = pd.DataFrame(columns=['tweet_id', 'sentiment_score'])
+    day_samples = [pd.DataFrame(columns=['tweet_id', 'sentiment_score'])]
+    total = 0
 
-    for filename in os.listdir(directory):
+    for filename, day_sample in sampled_days(directory, workers=workers):
 
-        if filename.endswith(".csv"):
-            day_sample = one_perc_sample(pd.read_csv(directory+filename, header=None,
-                                                     names=['tweet_id', 'sentiment_score']))
-
-            final_sample = final_sample.append(day_sample, ignore_index=True)
-            print(filename, len(day_sample), len(final_sample))
+        # concatenate once at the end instead of appending per file
+        day_samples.append(day_sample)
+        total += len(day_sample)
+        print(filename, len(day_sample), total)
 
+    final_sample = pd.concat(day_samples, ignore_index=True)
     # final_sample = final_sample.drop_duplicates(subset='tweet_id')
 
     print(len(final_sample))
     return final_sample
 
 
+def streamed_samples(workers=1):
+    '''
+    lists through all .csv files in ieee_data folder and
+    streams a 1% Bernoulli sample of each one straight into
+    sampled_tweetids.csv. Returns the number of rows written.
+
+    With more than one worker each process samples a whole file
+    and the parent writes the samples in sorted file order.
+    '''
+
+    directory = 'ieee_data/'
+    total = 0
+
+    with open('sampled_tweetids.csv', 'w', newline='') as out:
+        # write the same header the memory mode produces
+        pd.DataFrame(columns=['tweet_id', 'sentiment_score']).to_csv(out)
+
+        if workers > 1:
+            days = sampled_days(directory, 'stream', workers)
+        else:
+            # sample chunk by chunk so only one chunk is held at a time
+            days = ((filename, stream_sample(directory+filename))
+                    for filename in csv_files(directory))
+
+        for filename, day_sample in days:
+            day_total = 0
+
+            if isinstance(day_sample, pd.DataFrame):
+                day_sample = [day_sample]
+
+            for chunk_sample in day_sample:
+                # keep the running index so the file matches the memory mode
+                chunk_sample.index = range(total, total + len(chunk_sample))
+                chunk_sample.to_csv(out, header=False)
+                day_total += len(chunk_sample)
+                total += len(chunk_sample)
+
+            print(filename, day_total, total)
+
+    print(total)
+    return total
+
+
+def read_manifest(manifest_file):
+    '''
+    reads the manifest of daily files already sampled into
+    sampled_tweetids.csv. The manifest maps each filename to
+    the number of rows it contributed and records the size of
+    the output file after the last completed file.
+    '''
+
+    if not os.path.exists(manifest_file):
+        return {'files': {}, 'bytes': 0}
+
+    with open(manifest_file) as file:
+        return json.load(file)
+
+
+def write_manifest(manifest, manifest_file):
+    '''writes the manifest, replacing the old one in a single step'''
+
+    with open(manifest_file + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+def incremental_samples(workers=1):
+    '''
+    hash samples the .csv files in ieee_data folder which are not
+    in the manifest yet and appends them to sampled_tweetids.csv.
+    Returns the number of rows in the file.
+    '''
+
+    directory = 'ieee_data/'
+    output_file = 'sampled_tweetids.csv'
+    manifest_file = 'sampled_manifest.json'
+
+    manifest = read_manifest(manifest_file)
+    if not os.path.exists(output_file):
+        manifest = {'files': {}, 'bytes': 0}
+
+    new_files = [filename for filename in csv_files(directory)
+                 if filename not in manifest['files']]
+    total = sum(manifest['files'].values())
+    print('{} files already sampled, {} new'.format(len(manifest['files']), len(new_files)))
+
+    with open(output_file, 'a', newline='') as out:
+        # drop anything written after the last file recorded in the manifest
+        out.truncate(manifest['bytes'])
+        out.seek(manifest['bytes'])
+
+        if manifest['bytes'] == 0:
+            pd.DataFrame(columns=['tweet_id', 'sentiment_score']).to_csv(out)
+
+        for filename, day_sample in sampled_days(directory, 'hash', workers, new_files):
+            day_sample.index = range(total, total + len(day_sample))
+            day_sample.to_csv(out, header=False)
+            out.flush()
+            total += len(day_sample)
+
+            # only record the file once its rows are on disk
+            manifest['files'][filename] = len(day_sample)
+            manifest['bytes'] = out.tell()
+            write_manifest(manifest, manifest_file)
+            print(filename, len(day_sample), total)
+
+    print(total)
+    return total
+
+
 def write_file(df):
     '''writes the final dataframe to csv'''
 
@@ -52,10 +265,20 @@ def write_file(df):
     df.to_csv('sampled_tweetids.csv', chunksize=25000)
 
 
-def main():
+def main(mode='memory', workers=1):
     '''Take samples, combine, and write files'''
 
-    final_file = combined_samples()
+    workers = int(workers)
+
+    if mode in ('stream', 'hash'):
+        if mode == 'stream':
+            total = streamed_samples(workers)
+        else:
+            total = incremental_samples(workers)
+        print('Done, daily samples taken. File length is {}'.format(total))
+        return
+
+    final_file = combined_samples(workers)
     print('writing file...')
     write_file(final_file)
     print('Done, daily samples taken. File length is {}'.format(len(final_file)))
@@ -63,4 +286,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(*sys.argv[1:])
@@ -0,0 +1,41 @@
+'''
+Moves several newly written files into place together.
+
+Each new file is first written next to the file it replaces as <path>.tmp. The
+paths are then listed in a pending file, which is the point at which the update
+counts as done, and only then are the .tmp files moved into place. An update
+interrupted before the pending file is written leaves the old files as they
+were, and one interrupted while moving the files is finished by calling
+finishPending at the start of the next run.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import os
+
+
+def finishPending(pendingFile):
+    '''Move the files listed in the pending file into place, finishing an update.'''
+    if not os.path.exists(pendingFile):
+        return
+    with open(pendingFile) as f:
+        for path in f.read().splitlines():
+            if os.path.exists(path + '.tmp'):
+                os.replace(path + '.tmp', path)
+    os.remove(pendingFile)
+
+
+def commitPending(pendingFile, paths):
+    '''List the written files in the pending file and move them into place.
+
+    Keyword arguments:
+    pendingFile -- the filepath of the list of files to move
+    paths -- the filepaths whose <path>.tmp files are moved into place
+
+    '''
+    with open(pendingFile + '.tmp', 'w') as f:
+        f.write('\n'.join(paths))
+    os.replace(pendingFile + '.tmp', pendingFile)
+    finishPending(pendingFile)
@@ -0,0 +1,275 @@
+'''
+Builds a pyramid of pre-aggregated token counts and sentiment at hour, day,
+week and phase resolution, and reads the table for any resolution back.
+
+The Tweets are read once, a chunk at a time, and their n-grams and sentiment
+scores are added up per hour. Every coarser level is then made from the level
+below it instead of from the Tweets:
+    hour -> day -> week (weeks start on Monday)
+            day -> phase (phases can start mid-week, so they are made from days)
+Queries read the pre-aggregated table of the level asked for, so zooming from
+phases down to hours never groups the full counts table.
+
+Keyword arguments:
+tweetFile -- the file which contains all the Tweets, either allTweets.csv or the
+             allTweets_parquet store written by combineTweetCSVs.py
+ngramSizes -- (optional) comma separated n-gram sizes to count, default 1,2
+directory -- (optional) the folder the tables are written to, default rollups
+chunksize -- (optional) the number of Tweets read at a time, default 500000
+workers -- (optional) the number of processes to tokenize with, default 1
+
+Output, one csv per level (hour, day, week and phase) in the directory:
+<name>_<level>.csv -- period, tokenized, counts for each n-gram size, named
+    after the tokenizer output, e.g. tokenizedTweetsSingleWord_day.csv
+sentiment_<level>.csv -- period, sentimentSum, sentimentCount, sentimentScore
+
+If you have not installed the below packages they must be installed
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import tweetStore
+import tweetNgramPipeline
+import covidPhases
+
+LEVELS = ['hour', 'day', 'week', 'phase']
+
+# The level each level is made from
+PARENT_LEVELS = {'day': 'hour', 'week': 'day', 'phase': 'day'}
+
+# The length of a period of each level, used to pick the level for a time span
+LEVEL_LENGTHS = {'hour': pd.Timedelta(hours=1), 'day': pd.Timedelta(days=1), 'week': pd.Timedelta(days=7)}
+
+# filepath -> (modification time, table) of the tables read by readRollup
+_tableCache = {}
+
+
+def rollupFile(directory, name, level):
+    '''Get the filepath of the table of one level, name is a tokenizer output name or sentiment.'''
+    return os.path.join(directory, '{}_{}.csv'.format(name, level))
+
+
+def outputName(output):
+    '''Get the table name of an NgramOutput, its csv name without the extension.'''
+    return os.path.splitext(os.path.basename(output.fileName))[0]
+
+
+def coarserPeriods(periods, level, phases=None):
+    '''Map the periods of the level below to the periods of level.
+
+    Keyword arguments:
+    periods -- series of hours (datetime64) for day, or of days (datetime64) for week and phase
+    level -- day, week or phase
+    phases -- (optional) dataframe from covidPhases.readPhases, read if not given
+
+    Return:
+    periods -- series of the day or week start (datetime64), or of the phase label
+        (NaN for days outside every phase)
+
+    '''
+    if level == 'day':
+        return periods.dt.floor('D')
+    if level == 'week':
+        return periods.dt.to_period('W-SUN').dt.start_time
+    return pd.Series(covidPhases.phaseLabels(periods, phases), index=periods.index)
+
+
+def rollUp(table, level, phases=None):
+    '''Make the table of level from the table of the level below it.
+
+    The n-gram counts, or the sentiment sums and counts, are added up per period.
+    Days outside every phase are left out of the phase table.
+
+    '''
+    periods = coarserPeriods(table['period'], level, phases)
+    table = table.assign(period=periods.astype(str) if level == 'phase' else periods)[periods.notna().to_numpy()]
+    if 'tokenized' in table.columns:
+        return table.groupby(['period', 'tokenized'], as_index=False, sort=True)['counts'].sum()
+    rolled = table.groupby('period', as_index=False, sort=True)[['sentimentSum', 'sentimentCount']].sum()
+    rolled['sentimentScore'] = rolled['sentimentSum'] / rolled['sentimentCount']
+    return rolled
+
+
+def pyramid(hourTable, phases=None):
+    '''Make every level from the hourly table, each from the level below it.
+
+    Return:
+    tables -- dictionary of level -> table
+
+    '''
+    tables = {'hour': hourTable}
+    for level in LEVELS[1:]:
+        tables[level] = rollUp(tables[PARENT_LEVELS[level]], level, phases)
+    return tables
+
+
+def hourlyCounts(counter):
+    '''Create the hourly counts table from a Counter of (hour, n-gram) -> count.'''
+    keys = sorted(counter)
+    return pd.DataFrame({'period': pd.to_datetime([key[0] for key in keys]),
+                         'tokenized': [key[1] for key in keys],
+                         'counts': [counter[key] for key in keys]},
+                        columns=['period', 'tokenized', 'counts'])
+
+
+def countHours(tweetFile, outputs, chunksize=500000, workers=1):
+    '''Read the Tweets once and add up the n-grams and sentiment scores of each hour.
+
+    Memory grows with the hours and the vocabulary, not with the number of Tweets.
+
+    Return:
+    counts -- list with a Counter of (hour, n-gram) -> count for each output
+    sentiment -- dataframe with period (the hour), sentimentSum, sentimentCount
+        and sentimentScore columns
+
+    '''
+    columns = ['id', 'timestamp', 'text', 'sentimentScore']
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=tweetNgramPipeline.initWorker) \
+        if workers > 1 else None
+
+    counts = [Counter() for output in outputs]
+    sums = pd.Series(dtype='float64')
+    tweetCounts = pd.Series(dtype='int64')
+    try:
+        # Repeated rows are dropped across chunks as tweetNgramPipeline does, so the
+        # tables add up to the same counts as its output files
+        chunks = tweetStore.iterTweets(tweetFile, columns, chunksize=chunksize)
+        for chunk in tweetStore.dropDuplicateTweets(chunks):
+            hours = chunk['timestamp'].dt.floor('h')
+            texts = tweetNgramPipeline.cleanTweets(chunk['text'])
+
+            if executor is not None:
+                partial = tweetNgramPipeline.parallelCountNgrams(executor, hours, texts, outputs)
+            else:
+                partial = tweetNgramPipeline.countNgrams(hours, texts, outputs)
+            counts = tweetNgramPipeline.mergeCounts([counts, partial])
+
+            hourSentiment = chunk.groupby(hours)['sentimentScore'].agg(['sum', 'count'])
+            sums = sums.add(hourSentiment['sum'], fill_value=0)
+            tweetCounts = tweetCounts.add(hourSentiment['count'], fill_value=0)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    sentiment = pd.DataFrame({'sentimentSum': sums, 'sentimentCount': tweetCounts.astype('int64')}).sort_index()
+    sentiment = sentiment.rename_axis('period').reset_index()
+    sentiment['period'] = pd.to_datetime(sentiment['period'])
+    sentiment['sentimentScore'] = sentiment['sentimentSum'] / sentiment['sentimentCount']
+    return counts, sentiment
+
+
+def writePyramid(tables, directory, name):
+    '''Write the table of every level, the day and week periods as dates.'''
+    os.makedirs(directory, exist_ok=True)
+    for level, table in tables.items():
+        table = table.copy()
+        if level in ('day', 'week'):
+            table['period'] = table['period'].dt.strftime('%Y-%m-%d')
+        fileName = rollupFile(directory, name, level)
+        table.to_csv(fileName + '.tmp', index=False)
+        os.replace(fileName + '.tmp', fileName)
+        print('{} created, {} rows'.format(fileName, len(table)))
+
+
+def readRollup(level, name='tokenizedTweetsSingleWord', directory='rollups'):
+    '''Read the pre-aggregated table of one level.
+
+    Tables are kept in memory after the first read and read again only when the
+    file changes, so repeated queries while zooming do not re-read the csv.
+
+    Keyword arguments:
+    level -- hour, day, week or phase
+    name -- the tokenizer output name (e.g. tokenizedTweets) or sentiment
+    directory -- the folder written by this script
+
+    Return:
+    table -- dataframe with a period column (datetime64 for hour, day and week,
+        the phase label for phase) and the counts or sentiment columns
+
+    '''
+    if level not in LEVELS:
+        raise ValueError('level must be one of {}: {}'.format(', '.join(LEVELS), level))
+    fileName = rollupFile(directory, name, level)
+    modified = os.path.getmtime(fileName)
+    cached = _tableCache.get(fileName)
+    if cached is None or cached[0] != modified:
+        # Only the tokens are read without NA values, so words like null and nan stay words
+        table = pd.read_csv(fileName, keep_default_na=False, na_values={'sentimentScore': ['']},
+                            dtype={'period': 'object', 'tokenized': 'object'})
+        if level != 'phase':
+            table['period'] = pd.to_datetime(table['period'])
+        cached = _tableCache[fileName] = (modified, table)
+    return cached[1]
+
+
+def levelFor(startDate, endDate, maxPeriods=400):
+    '''Pick the finest level with at most maxPeriods periods between two dates.'''
+    span = pd.Timestamp(endDate) + pd.Timedelta(days=1) - pd.Timestamp(startDate)
+    for level in ['hour', 'day', 'week']:
+        if span / LEVEL_LENGTHS[level] <= maxPeriods:
+            return level
+    return 'phase'
+
+
+def queryRollup(level=None, name='tokenizedTweetsSingleWord', tokens=None, startDate=None, endDate=None,
+                directory='rollups', maxPeriods=400):
+    '''Get the counts or sentiment of a time span at one level of the pyramid.
+
+    Keyword arguments:
+    level -- (optional) hour, day, week or phase. If None the finest level with at
+             most maxPeriods periods between startDate and endDate is used
+    name -- the tokenizer output name (e.g. tokenizedTweets) or sentiment
+    tokens -- (optional) list of the words, or n-gram tuples, to keep
+    startDate -- (optional) the first date to keep, inclusive
+    endDate -- (optional) the last date to keep, inclusive
+    directory -- the folder written by this script
+    maxPeriods -- the most periods when the level is picked
+
+    Return:
+    table -- dataframe of the rows of the level, phases are kept when they
+        overlap the dates
+
+    '''
+    if level is None:
+        level = levelFor(startDate, endDate, maxPeriods) if startDate is not None and endDate is not None else 'phase'
+    table = readRollup(level, name, directory)
+
+    keep = pd.Series(True, index=table.index)
+    if tokens is not None:
+        keep &= table['tokenized'].isin([str(token) for token in tokens])
+    if level == 'phase':
+        phases = covidPhases.readPhases()
+        if startDate is not None:
+            phases = phases[phases['end'] >= pd.Timestamp(startDate)]
+        if endDate is not None:
+            phases = phases[phases['start'] <= pd.Timestamp(endDate)]
+        keep &= table['period'].isin(phases['label'])
+    else:
+        if startDate is not None:
+            keep &= table['period'] >= pd.Timestamp(startDate)
+        if endDate is not None:
+            keep &= table['period'] < pd.Timestamp(endDate) + pd.Timedelta(days=1)
+    return table[keep.to_numpy()]
+
+
+def main(tweetFile, ngramSizes='1,2', directory='rollups', chunksize=500000, workers=1):
+    outputs = [tweetNgramPipeline.ngramOutput(n) for n in str(ngramSizes).split(',')]
+    phases = covidPhases.readPhases()
+
+    counts, sentiment = countHours(tweetFile, outputs, int(chunksize), int(workers))
+    for output, counter in zip(outputs, counts):
+        writePyramid(pyramid(hourlyCounts(counter), phases), directory, outputName(output))
+    writePyramid(pyramid(sentiment, phases), directory, 'sentiment')
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
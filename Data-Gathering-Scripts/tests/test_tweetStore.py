@@ -0,0 +1,54 @@
+'''
+Tests that repeated Tweet rows are dropped across chunk boundaries the same way
+drop_duplicates drops them over the whole file.
+
+Run from the repository root with: python -m pytest Data-Gathering-Scripts/tests
+'''
+
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tweetStore
+
+
+def sortedTweets():
+    '''Make Tweets sorted by timestamp, several on each day and some on the same minute.'''
+    timestamps = pd.to_datetime(['2020-03-01 10:00', '2020-03-01 10:00', '2020-03-01 23:59',
+                                 '2020-03-02 00:00', '2020-03-02 08:30', '2020-03-02 08:30',
+                                 '2020-03-03 12:00', '2020-03-04 09:00'])
+    return pd.DataFrame({'id': range(1, len(timestamps) + 1),
+                         'timestamp': timestamps,
+                         'text': ['tweet {}'.format(i) for i in range(len(timestamps))]})
+
+
+def chunked(tweets, chunksize):
+    return [tweets.iloc[i:i + chunksize] for i in range(0, len(tweets), chunksize)]
+
+
+def dropInChunks(tweets, chunksize):
+    return pd.concat(tweetStore.dropDuplicateTweets(chunked(tweets, chunksize)))
+
+
+def test_duplicate_on_chunk_boundary():
+    tweets = sortedTweets()
+    # Repeat the last row of the first chunk as the first row of the second
+    withRepeat = pd.concat([tweets.iloc[:3], tweets.iloc[2:3], tweets.iloc[3:]], ignore_index=True)
+    for chunksize in range(1, len(withRepeat) + 1):
+        result = dropInChunks(withRepeat, chunksize)
+        pd.testing.assert_frame_equal(result, withRepeat.drop_duplicates())
+
+
+def test_repeats_spanning_several_chunks():
+    tweets = sortedTweets()
+    withRepeats = pd.concat([tweets.iloc[:5]] + [tweets.iloc[4:5]] * 7 + [tweets.iloc[5:]], ignore_index=True)
+    for chunksize in (1, 2, 3, 5):
+        result = dropInChunks(withRepeats, chunksize)
+        pd.testing.assert_frame_equal(result, withRepeats.drop_duplicates())
+
+
+def test_same_minute_different_tweets_kept():
+    tweets = sortedTweets()
+    result = dropInChunks(tweets, 1)
+    pd.testing.assert_frame_equal(result, tweets)
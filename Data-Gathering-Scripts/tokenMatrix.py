@@ -0,0 +1,97 @@
+'''
+Saves the daily token counts as a sparse date by token matrix.
+
+Each token (a word, or an n-gram joined with spaces) gets an integer id from a
+vocabulary table which is kept between runs, so a token keeps its id and column
+as new data is counted. The counts are saved as a SciPy sparse matrix with one
+row per date, next to the vocabulary and the date index:
+
+    <prefix>_counts.npz -- the sparse date x token matrix of counts
+    <prefix>_vocab.csv -- id, token
+    <prefix>_dates.csv -- row, date, covid phase
+
+Requires scipy: pip install scipy
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import os
+import numpy as np
+import pandas as pd
+
+
+def matrixFiles(prefix):
+    '''Get the counts, vocabulary and date index filepaths for a prefix.'''
+    return prefix + '_counts.npz', prefix + '_vocab.csv', prefix + '_dates.csv'
+
+
+def tokenKey(gram):
+    '''Get the vocabulary entry for a word or an n-gram tuple.'''
+    return gram if isinstance(gram, str) else ' '.join(gram)
+
+
+def readVocabulary(vocabFile):
+    '''Read the vocabulary table, returning a list of the tokens in id order.'''
+    if not os.path.exists(vocabFile):
+        return []
+    vocab = pd.read_csv(vocabFile, keep_default_na=False, dtype={'token': 'object'})
+    return vocab.sort_values('id')['token'].tolist()
+
+
+def writeCountMatrix(countsDf, prefix):
+    '''Save the daily counts as a sparse matrix with the vocabulary and date index.
+
+    Tokens already in the vocabulary keep their ids, new tokens are added to the end.
+
+    Keyword arguments:
+    countsDf -- dataframe with date, tokenized, counts and covid phase columns
+    prefix -- the start of the filepaths written, e.g. tokenizedTweets
+
+    Return:
+    shape -- the (dates, tokens) shape of the matrix
+
+    '''
+    from scipy import sparse
+
+    countsFile, vocabFile, datesFile = matrixFiles(prefix)
+
+    # Extend the vocabulary with the new tokens in sorted order
+    vocab = readVocabulary(vocabFile)
+    tokenIds = {token: tokenId for tokenId, token in enumerate(vocab)}
+    tokens = countsDf['tokenized'].map(tokenKey)
+    for token in sorted(set(tokens) - set(tokenIds)):
+        tokenIds[token] = len(vocab)
+        vocab.append(token)
+
+    # One row per date, in date order
+    dates = countsDf[['date', 'covid phase']].drop_duplicates('date').sort_values('date')
+    rowIds = pd.Series(np.arange(len(dates)), index=dates['date'].values)
+
+    matrix = sparse.csr_matrix((countsDf['counts'].to_numpy(dtype=np.int64),
+                                (rowIds.loc[countsDf['date'].values].to_numpy(), tokens.map(tokenIds).to_numpy())),
+                               shape=(len(dates), len(vocab)))
+    sparse.save_npz(countsFile, matrix)
+
+    pd.DataFrame({'id': np.arange(len(vocab)), 'token': vocab}).to_csv(vocabFile, index=False)
+    dates.insert(0, 'row', np.arange(len(dates)))
+    dates.to_csv(datesFile, index=False)
+
+    print('{} created with {} dates and {} tokens'.format(countsFile, matrix.shape[0], matrix.shape[1]))
+    return matrix.shape
+
+
+def readCountMatrix(prefix):
+    '''Load a count matrix saved by writeCountMatrix.
+
+    Return:
+    matrix -- scipy CSR matrix of counts, one row per date and one column per token id
+    dates -- dataframe of the row, date and covid phase for each matrix row
+    vocab -- list of the tokens in id order
+
+    '''
+    from scipy import sparse
+
+    countsFile, vocabFile, datesFile = matrixFiles(prefix)
+    return sparse.load_npz(countsFile), pd.read_csv(datesFile), readVocabulary(vocabFile)
@@ -0,0 +1,124 @@
+'''
+Shared tokenizing and lemmatizing of Tweets for the tokenizer scripts.
+
+The TweetTokenizer, the WordNetLemmatizer and the stopword sets are created once
+and reused for every Tweet. Stopwords are held in a frozenset so each check is a
+hash lookup, and lemmatization is memoized with a bounded LRU cache since the
+same words come up again and again.
+
+normalizeTweet cleans the raw text of a Tweet before it is tokenized in one pass
+over the string, with the patterns compiled once.
+
+If you have not installed the below packages they must be installed
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import re
+import string
+from functools import lru_cache
+from nltk.stem.wordnet import WordNetLemmatizer
+from nltk.tokenize import TweetTokenizer
+from nltk.corpus import stopwords
+
+# Words removed on top of the nltk english stopwords and punctuation
+# The stopword lists were found here: https://www.youtube.com/watch?v=7N_2OsLXFlA&list=PLmcBskOCOOFW1SNrz6_yzCEKGvh65wYb9&index=19
+# and modified by including other words to remove
+BIGRAM_STOPWORDS = ('rt', 'via', '...', '..', 'u', 'ur', 'r', 'n')
+SINGLE_WORD_STOPWORDS = ('rt', 'via', '...', 'u', 'ur', 'r', 'n', 'covid', 'coronavirus', 'covid19', 'corona')
+
+# Links and hashtag symbols, and newlines for the outputs which remove them. The
+# text is ASCII by the time these run, so \S only has ASCII characters to match
+LINK_HASH_PATTERN = re.compile(r"http\S+|#+")
+LINK_HASH_NEWLINE_PATTERN = re.compile(r"http\S+|#+|\n")
+
+
+def normalizeTweet(text, removeNewlines=False):
+    '''Lowercase a Tweet, remove non-ASCII characters, links and hashtag symbols.
+
+    Gives the same text as lowercasing, ASCII encoding and then removing the links,
+    the hashtag symbols and (optionally) the newlines one after the other.
+
+    Keyword arguments:
+    text -- the raw Tweet text
+    removeNewlines -- also remove newlines, which joins the words either side of them
+
+    Return:
+    text -- the cleaned Tweet text
+
+    '''
+    if not isinstance(text, str):
+        return text
+    # Found code for igonring non-ascii characters: https://stackoverflow.com/questions/36340627/remove-non-ascii-characters-from-pandas-column
+    # modified the code to work on one string and by adding lower()
+    pattern = LINK_HASH_NEWLINE_PATTERN if removeNewlines else LINK_HASH_PATTERN
+    return pattern.sub('', text.lower().encode('ascii', 'ignore').decode('ascii'))
+
+
+@lru_cache(maxsize=None)
+def stopwordSet(extraWords=()):
+    '''Get the set of words to remove.
+
+    Keyword argument:
+    extraWords -- tuple of words to remove on top of the english stopwords and punctuation
+
+    Return:
+    swords -- frozenset of the words to remove
+
+    '''
+    return frozenset(stopwords.words('english') + list(string.punctuation) + list(extraWords))
+
+
+class TokenizerEngine:
+    '''Tokenizes and lemmatizes Tweets with resources which are created once.
+
+    Keyword argument:
+    cacheSize -- the number of lemmas to keep in the LRU cache
+
+    '''
+    def __init__(self, cacheSize=200000):
+        self.tokenizer = TweetTokenizer(strip_handles=True, reduce_len=True)
+        self.lemmatize = lru_cache(maxsize=cacheSize)(WordNetLemmatizer().lemmatize)
+
+    def lemmas(self, tweet):
+        '''Tokenize a cleaned Tweet, remove numbers and lemmatize each word.
+
+        Keyword argument:
+        tweet -- the Tweet to be processed
+
+        Return:
+        lemmaList -- list of the lemmatized words
+
+        '''
+        return [self.lemmatize(word) for word in self.tokenizer.tokenize(tweet) if not word.isdigit()]
+
+    def tokens(self, tweet, swords):
+        '''Tokenize and lemmatize a cleaned Tweet and remove the stopwords.
+
+        Keyword arguments:
+        tweet -- the Tweet to be processed
+        swords -- frozenset of the words to remove, from stopwordSet
+
+        Return:
+        tokenList -- list of the lemmatized words which are not stopwords
+
+        '''
+        return [lemma for lemma in self.lemmas(tweet) if lemma not in swords]
+
+    def cacheReport(self):
+        '''Return a summary of the lemma cache hits and misses.'''
+        info = self.lemmatize.cache_info()
+        total = info.hits + info.misses
+        hitRate = info.hits / total if total else 0
+        return 'Lemma cache hits: {} misses: {} ({:.1%} hit rate, {} cached)'.format(
+            info.hits, info.misses, hitRate, info.currsize)
+
+
+@lru_cache(maxsize=None)
+def sharedEngine():
+    '''Get the TokenizerEngine shared by all the Tweets processed in this process.'''
+    return TokenizerEngine()
@@ -0,0 +1,219 @@
+'''
+Concurrent hydration of Tweet ids through the Twitter statuses/lookup endpoint.
+
+Keeps several lookups of 100 Tweet ids in flight at once from a pool of threads.
+A local token bucket decides when a lookup may be sent. The bucket is kept in
+sync with the x-rate-limit-remaining and x-rate-limit-reset headers returned
+with every response, so the API never needs to be polled with rate_limit_status.
+Failed lookups are retried with exponential backoff.
+
+The base url can point at a local server (see fakeTwitterApi.py) for testing.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import tweepy
+from requests_oauthlib import OAuth1
+
+TWITTER_API = 'https://api.twitter.com'
+LOOKUP_PATH = '/1.1/statuses/lookup.json'
+
+
+class TokenBucket:
+    '''Counts the lookups left in the current rate limit window.
+
+    Keyword arguments:
+    capacity -- number of lookups allowed per window
+    window -- length of the rate limit window in seconds
+
+    '''
+    def __init__(self, capacity=900, window=900):
+        self.capacity = capacity
+        self.window = window
+        self.tokens = capacity
+        self.resetAt = time.time() + window
+        self.reported = None
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        '''Take one token, waiting for the window to reset if there are none left.'''
+        with self.condition:
+            while True:
+                now = time.time()
+                if now >= self.resetAt:
+                    self.tokens = self.capacity
+                    self.resetAt = now + self.window
+                if self.tokens > 0:
+                    self.tokens -= 1
+                    return
+                wait = self.resetAt - now
+                if self.reported != self.resetAt:
+                    self.reported = self.resetAt
+                    print('Rate limit reached, waiting {:.0f} seconds'.format(wait))
+                self.condition.wait(wait)
+
+    def update(self, remaining, resetAt, limit=None):
+        '''Sync the bucket with the rate limit headers from a response.
+
+        Keyword arguments:
+        remaining -- value of the x-rate-limit-remaining header
+        resetAt -- value of the x-rate-limit-reset header (epoch seconds)
+        limit -- value of the x-rate-limit-limit header
+
+        '''
+        # The header is rounded down to the second so allow an extra second
+        resetAt = resetAt + 1
+        with self.condition:
+            if limit is not None:
+                self.capacity = limit
+            if resetAt > self.resetAt + 1:
+                # The server has started a new window
+                self.tokens = remaining
+            else:
+                # Lookups still in flight are not counted by the server yet
+                self.tokens = min(self.tokens, remaining)
+            self.resetAt = resetAt
+            self.condition.notify_all()
+
+    def remaining(self):
+        '''Return the number of lookups left in the current window.'''
+        with self.condition:
+            return self.tokens
+
+
+class Hydrator:
+    '''Looks up batches of Tweet ids with several requests in flight.
+
+    Keyword arguments:
+    auth -- requests auth object used to sign each request
+    baseUrl -- url of the Twitter API, or of a local fake API for testing
+    workers -- number of lookups kept in flight
+    maxRetries -- number of times a failed lookup is retried, and separately a rate limited one
+    backoff -- seconds to wait before the first retry, doubled on each retry
+
+    '''
+    def __init__(self, auth, baseUrl=TWITTER_API, workers=8, maxRetries=5, backoff=1.0):
+        self.auth = auth
+        self.url = baseUrl.rstrip('/') + LOOKUP_PATH
+        self.workers = workers
+        self.maxRetries = maxRetries
+        self.backoff = backoff
+        self.limiter = TokenBucket()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def fromSecrets(cls, tokenSecretFile, **kwargs):
+        '''Create a Hydrator from the same secrets file setupApi uses.
+
+        Keyword arguments:
+        tokenSecretFile -- a text file which contains a dictionary containing the token and consumer keys and secrets.
+
+        Return:
+        hydrator -- the Hydrator object
+
+        '''
+        with open(tokenSecretFile) as file:
+            tokenConsumerInfo = json.load(file)
+
+        auth = OAuth1(tokenConsumerInfo['consumerKey'], tokenConsumerInfo['consumerSecret'],
+                      tokenConsumerInfo['token'], tokenConsumerInfo['tokenSecret'])
+        return cls(auth, **kwargs)
+
+    def lookup(self, tweetIds):
+        '''Look up to 100 Tweet ids, retrying with backoff on failure.
+
+        Keyword argument:
+        tweetIds -- list of up to 100 tweet ids
+
+        Return:
+        tweets -- list of tweepy Status objects for the Tweets which still exist
+
+        '''
+        if len(tweetIds) == 0:
+            return []
+
+        params = {'id': ','.join(str(tweetId) for tweetId in tweetIds), 'tweet_mode': 'extended'}
+
+        attempt = 0
+        rateLimited = 0
+        while attempt <= self.maxRetries:
+            self.limiter.acquire()
+            try:
+                response = self.session.get(self.url, params=params, auth=self.auth, timeout=60)
+            except requests.RequestException as e:
+                error = [{'message': str(e), 'code': None}]
+            else:
+                self.updateLimiter(response)
+                if response.status_code == 200:
+                    return [tweepy.Status.parse(None, tweet) for tweet in response.json()]
+                error = self.errors(response)
+                if response.status_code == 429:
+                    # The limiter now waits for the next window, but a reset header at or behind
+                    # the local clock lets the next lookup go at once, so wait at least the backoff
+                    # and give up after maxRetries rate limited responses
+                    rateLimited += 1
+                    if rateLimited > self.maxRetries:
+                        raise tweepy.TweepError(error)
+                    time.sleep(self.backoff * (1 + random.random()))
+                    continue
+                if response.status_code < 500:
+                    raise tweepy.TweepError(error)
+
+            if attempt < self.maxRetries:
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+            attempt += 1
+
+        raise tweepy.TweepError(error)
+
+    def updateLimiter(self, response):
+        '''Feed the rate limit headers of a response to the token bucket.'''
+        remaining = response.headers.get('x-rate-limit-remaining')
+        resetAt = response.headers.get('x-rate-limit-reset')
+        limit = response.headers.get('x-rate-limit-limit')
+        if remaining is not None and resetAt is not None:
+            self.limiter.update(int(remaining), int(resetAt), int(limit) if limit is not None else None)
+        elif response.status_code == 429:
+            self.limiter.update(0, int(time.time() + self.limiter.window))
+
+    @staticmethod
+    def errors(response):
+        '''Get the error list from a failed response in the format Twitter returns it.'''
+        try:
+            return response.json()['errors']
+        except (ValueError, KeyError, TypeError):
+            return [{'message': response.text, 'code': response.status_code}]
+
+    def hydrate(self, tweetGroups):
+        '''Start a lookup for each group of Tweet ids, keeping several lookups in flight.
+
+        Keyword argument:
+        tweetGroups -- iterable of lists of up to 100 tweet ids
+
+        Return:
+        generator which yields a future for each group, in the order of the groups.
+            Calling result() on the future returns the list of tweepy Status objects
+            or raises the tweepy.TweepError of a lookup which failed.
+
+        '''
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for tweetGroup in tweetGroups:
+                pending.append(executor.submit(self.lookup, tweetGroup))
+                # Only queue a few groups ahead so the results are not all held in memory
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
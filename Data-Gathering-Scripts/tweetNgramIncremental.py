@@ -0,0 +1,183 @@
+'''
+Adds new Tweets to the daily word and n-gram counts without re-reading or
+re-tokenizing the Tweets which have already been counted.
+
+The counts are kept in a store folder with one csv per output and date,
+e.g. tokenCounts/tokenizedTweets/date=2020-03-01.csv, and the ids of the Tweets
+already counted are kept in tokenCounts/countedIds.npy (an idFilters.IdHashSet).
+Each run only tokenizes the Tweets whose ids are not in the store, adds their
+counts to the partitions of the dates they fall on, and rewrites only those
+partitions, so a run takes time for the new Tweets and not for the whole
+history. readStore reads the counts of an output back from its partitions. With
+an output format the output files of tweetNgramPipeline.py are also rebuilt from
+all the partitions, and match a full run over all the Tweets.
+
+The new partitions and ids are first written next to the old files and listed
+in tokenCounts/pending.txt, and only then moved into place. A run which is
+interrupted while moving them is finished by the next run, so no Tweet is
+counted twice.
+
+Only the new Tweets should be read each run. Pass the newly hydrated Tweet csv
+(e.g. tweet_data/covidTweets_<date_time>.csv), or the allTweets_parquet store,
+of which only the date partitions from the newest date already in the counts
+store on are read. Passing allTweets.csv also works, but the whole file is
+parsed every run.
+
+Keyword arguments:
+tweetFile -- the new Tweets, a hydrated Tweet csv or the allTweets_parquet store
+             written by combineTweetCSVs.py
+ngramSizes -- (optional) comma separated n-gram sizes to count, default 1,2. Use
+              the same sizes every run, a size added later only counts new Tweets
+storeDirectory -- (optional) the folder for the counts store, default tokenCounts
+chunksize -- (optional) the number of Tweets read at a time, default 500000
+workers -- (optional) the number of processes to tokenize with, default 1
+outputFormat -- (optional) none (default) only updates the store, csv, matrix or both
+                also rebuild the output files as for tweetNgramPipeline.py
+startDate -- (optional) the first date of Tweets to read, latest for the newest date
+             in the counts store or all for every date. By default latest for the
+             Parquet store and all for a csv, which should only hold new Tweets
+
+If you have not installed the below packages they must be installed
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import ast
+import os
+import sys
+from collections import Counter, defaultdict
+import pandas as pd
+import idFilters
+import pendingFiles
+import tweetNgramPipeline
+
+
+def partitionDirectory(storeDirectory, output):
+    '''Get the folder which holds the date partitions of an output.'''
+    return os.path.join(storeDirectory, os.path.splitext(output.fileName)[0])
+
+
+def readPartition(partitionFile, output):
+    '''Read one date partition as a Counter of (date, n-gram) -> count.'''
+    partition = pd.read_csv(partitionFile, keep_default_na=False, dtype={'tokenized': 'object'})
+    dates = pd.to_datetime(partition['date']).dt.date
+    grams = partition['tokenized']
+    if output.n > 1:
+        # n-grams are saved the way pandas writes a tuple, e.g. "('stay', 'home')"
+        grams = grams.map(ast.literal_eval)
+    return Counter(dict(zip(zip(dates, grams), partition['counts'])))
+
+
+def writePartition(partitionFile, counter):
+    '''Write one date partition next to the old file as <partitionFile>.tmp.'''
+    keys = sorted(counter)
+    partition = pd.DataFrame({'date': [key[0] for key in keys],
+                              'tokenized': [key[1] for key in keys],
+                              'counts': [counter[key] for key in keys]},
+                             columns=['date', 'tokenized', 'counts'])
+    partition.to_csv(partitionFile + '.tmp', index=False)
+
+
+def mergePartitions(storeDirectory, output, counter):
+    '''Add new counts to the partitions of the dates they fall on.
+
+    Keyword arguments:
+    storeDirectory -- the folder of the counts store
+    output -- the NgramOutput the counts are for
+    counter -- Counter of (date, n-gram) -> count of the new Tweets
+
+    Return:
+    touched -- list of the partition files written, still to be moved into place
+
+    '''
+    directory = partitionDirectory(storeDirectory, output)
+    os.makedirs(directory, exist_ok=True)
+
+    byDate = defaultdict(Counter)
+    for (date, gram), count in counter.items():
+        byDate[date][(date, gram)] = count
+
+    touched = []
+    for date in sorted(byDate):
+        partitionFile = os.path.join(directory, 'date={}.csv'.format(date))
+        dateCounter = byDate[date]
+        if os.path.exists(partitionFile):
+            dateCounter.update(readPartition(partitionFile, output))
+        writePartition(partitionFile, dateCounter)
+        touched.append(partitionFile)
+
+    return touched
+
+
+def readStore(storeDirectory, output):
+    '''Read all the date partitions of an output into one Counter of (date, n-gram) -> count.'''
+    counter = Counter()
+    directory = partitionDirectory(storeDirectory, output)
+    if not os.path.isdir(directory):
+        return counter
+    for fileName in sorted(os.listdir(directory)):
+        if fileName.startswith('date=') and fileName.endswith('.csv'):
+            counter.update(readPartition(os.path.join(directory, fileName), output))
+    return counter
+
+
+def latestDate(storeDirectory, outputs):
+    '''Get the newest date with a partition in the store for any output, None if it is empty.'''
+    dates = []
+    for output in outputs:
+        directory = partitionDirectory(storeDirectory, output)
+        if os.path.isdir(directory):
+            dates += [fileName[len('date='):-len('.csv')] for fileName in os.listdir(directory)
+                      if fileName.startswith('date=') and fileName.endswith('.csv')]
+    return max(dates) if dates else None
+
+
+def main(tweetFile, ngramSizes='1,2', storeDirectory='tokenCounts', chunksize=500000, workers=1,
+         outputFormat='none', startDate=None):
+    outputs = [tweetNgramPipeline.ngramOutput(n) for n in str(ngramSizes).split(',')]
+    os.makedirs(storeDirectory, exist_ok=True)
+    pendingFile = os.path.join(storeDirectory, 'pending.txt')
+    pendingFiles.finishPending(pendingFile)
+
+    # The newest date may only be partly counted, so it is read again and the ids
+    # already counted are skipped. Earlier date partitions of the Parquet store are not read
+    if startDate is None:
+        startDate = 'latest' if os.path.isdir(tweetFile) else 'all'
+    if startDate == 'latest':
+        startDate = latestDate(storeDirectory, outputs)
+    elif startDate == 'all':
+        startDate = None
+    if startDate is not None:
+        print('Reading Tweets from {} on'.format(startDate))
+
+    # The ids of the Tweets which are already in the counts
+    idFile = os.path.join(storeDirectory, 'countedIds.npy')
+    idFilter = idFilters.IdHashSet.load(idFile) if os.path.exists(idFile) else idFilters.IdHashSet()
+    countedBefore = len(idFilter)
+
+    newCounts = tweetNgramPipeline.countTweets(tweetFile, outputs, startDate, workers=int(workers),
+                                               chunksize=int(chunksize), idFilter=idFilter)
+    print('{} new Tweets counted, {} already counted'.format(len(idFilter) - countedBefore, countedBefore))
+
+    written = []
+    for output, counter in zip(outputs, newCounts):
+        touched = mergePartitions(storeDirectory, output, counter)
+        print('{}: {} date partitions updated'.format(output.fileName, len(touched)))
+        written += touched
+
+    # The counted ids are moved into place together with the partitions
+    idFilter.save(idFile + '.tmp')
+    pendingFiles.commitPending(pendingFile, written + [idFile])
+
+    # Rebuilding the output files reads every partition, so it is only done when asked for
+    if outputFormat != 'none':
+        tweetNgramPipeline.writeOutputs(outputs, [readStore(storeDirectory, output) for output in outputs],
+                                        outputFormat)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,341 @@
+'''
+Counts the words and n-grams used in the Tweets each day in a single pass.
+
+Each Tweet is read, cleaned, tokenized and lemmatized once, and every requested
+n-gram size is counted from that one list of lemmas with its own stopword list.
+Retweets repeat the text of the original Tweet, so each distinct cleaned text of
+a chunk is only tokenized once and its n-grams are counted once for every Tweet
+which has it.
+tweetTokenizer.py (bi-grams) and tweetTokenizerSingleWord.py (single words) run
+this pipeline for one size each, running it for 1 and 2 together makes both
+files for the cost of one.
+
+Tokenizing is CPU bound. With more than one worker the cleaned Tweets are split
+into chunks which a pool of processes count, and the per-chunk counts are added
+up, giving the same counts as a single process.
+
+With a chunksize the Tweets are read that many rows at a time and each chunk's
+counts are added to running (date, n-gram) counts, so memory grows with the
+vocabulary rather than with the number of Tweets. Repeated rows are dropped as
+over the whole file, keeping only the rows of the latest date between chunks
+(see tweetStore.dropDuplicateTweets).
+
+Keyword arguments:
+tweetFile -- the file which contains all the Tweets, either allTweets.csv or the
+             allTweets_parquet store written by combineTweetCSVs.py
+ngramSizes -- (optional) comma separated n-gram sizes to count, default 1,2
+startDate -- (optional) the first date of Tweets to process
+endDate -- (optional) the last date of Tweets to process
+workers -- (optional) the number of processes to tokenize with, default 1
+chunksize -- (optional) the number of Tweets read at a time, 0 (default) reads them all at once
+outputFormat -- (optional) csv (default), matrix for the sparse count matrix of tokenMatrix.py, or both
+
+Output:
+tokenizedTweetsSingleWord.csv -- the count for each word per day (n = 1)
+tokenizedTweets.csv -- the count for each bi-gram per day (n = 2)
+tokenizedTweets_<n>gram.csv -- the count for each n-gram per day (n > 2)
+With the matrix output format each file is replaced by <name>_counts.npz,
+<name>_vocab.csv and <name>_dates.csv, e.g. tokenizedTweets_counts.npz
+
+If you have not installed the below packages they must be installed
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import os
+import sys
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import pandas as pd
+from nltk.util import ngrams
+import tweetStore
+import tokenizerEngine
+import tokenMatrix
+import covidPhases
+
+# n -- the n-gram size, 1 counts single words
+# fileName -- the csv the counts are written to
+# stopwords -- tuple of words removed on top of the english stopwords and punctuation
+# removeNewlines -- remove newlines from the Tweet text before tokenizing, which joins
+#     the words either side of them as tweetTokenizerSingleWord always has
+NgramOutput = namedtuple('NgramOutput', ['n', 'fileName', 'stopwords', 'removeNewlines'])
+
+
+def ngramOutput(n):
+    '''Get the output settings for an n-gram size, matching the tokenizer scripts for 1 and 2.'''
+    n = int(n)
+    if n == 1:
+        return NgramOutput(1, 'tokenizedTweetsSingleWord.csv', tokenizerEngine.SINGLE_WORD_STOPWORDS, True)
+    if n == 2:
+        return NgramOutput(2, 'tokenizedTweets.csv', tokenizerEngine.BIGRAM_STOPWORDS, False)
+    return NgramOutput(n, 'tokenizedTweets_{}gram.csv'.format(n), tokenizerEngine.BIGRAM_STOPWORDS, False)
+
+
+def cleanTweets(text):
+    '''Lowercase the Tweets, remove non-ASCII characters, links and hashtag symbols.
+
+    Newlines are kept, outputs which remove them do so from this cleaned text.
+
+    Keyword argument:
+    text -- series of the raw Tweet text
+
+    Return:
+    text -- list of the cleaned Tweet text
+
+    '''
+    # Each Tweet is cleaned in one pass, see benchmarkNormalization.py for the
+    # comparison with the pandas str and replace chain this was done with before
+    return [tokenizerEngine.normalizeTweet(tweet) for tweet in text]
+
+
+def tweetGrams(lemmas, output, swords):
+    '''Remove the stopwords from a Tweet's lemmas and make the n-grams for one output.'''
+    tokenList = [lemma for lemma in lemmas if lemma not in swords]
+    if output.n == 1:
+        return tokenList
+    return list(ngrams(tokenList, output.n))
+
+
+def distinctTexts(dates, texts):
+    '''Count how many times each cleaned text was Tweeted on each date.
+
+    Retweets repeat the text of the original Tweet, so many Tweets share a text.
+
+    Return:
+    dates -- list of the date of each distinct (date, text) pair
+    texts -- list of the text of each distinct pair
+    occurrences -- list of the number of Tweets with that text on that date
+
+    '''
+    textCounts = Counter(zip(dates, texts))
+    return [key[0] for key in textCounts], [key[1] for key in textCounts], list(textCounts.values())
+
+
+def countNgrams(dates, texts, outputs, occurrences=None, engine=None):
+    '''Count the n-grams for each day for every output, tokenizing each distinct text once.
+
+    The n-grams of a text are counted once for each Tweet with that text, so the
+    counts are the same as tokenizing every Tweet.
+
+    Keyword arguments:
+    dates -- iterable of the date of each Tweet
+    texts -- iterable of the cleaned text of each Tweet, from cleanTweets
+    outputs -- list of NgramOutput
+    occurrences -- (optional) iterable of the number of Tweets each (date, text) pair
+        stands for, from distinctTexts. The pairs are found here if not given
+    engine -- (optional) the TokenizerEngine to use, the shared engine by default
+
+    Return:
+    counts -- list with a Counter of (date, n-gram) -> count for each output
+
+    '''
+    engine = engine or tokenizerEngine.sharedEngine()
+    swordSets = [tokenizerEngine.stopwordSet(output.stopwords) for output in outputs]
+    counts = [Counter() for output in outputs]
+    if occurrences is None:
+        dates, texts, occurrences = distinctTexts(dates, texts)
+
+    textGrams = {}
+    for date, text, occurrence in zip(dates, texts, occurrences):
+        grams = textGrams.get(text)
+        if grams is None:
+            lemmas = engine.lemmas(text)
+            # Removing newlines only changes the tokens of Tweets which have them
+            joinedLemmas = engine.lemmas(text.replace('\n', '')) if '\n' in text else lemmas
+            grams = [tweetGrams(joinedLemmas if output.removeNewlines else lemmas, output, swords)
+                     for output, swords in zip(outputs, swordSets)]
+            textGrams[text] = grams
+
+        for outputGrams, counter in zip(grams, counts):
+            for gram in outputGrams:
+                counter[(date, gram)] += occurrence
+
+    return counts
+
+
+def initWorker():
+    '''Create the tokenizer engine in a worker process and load WordNet once.'''
+    tokenizerEngine.sharedEngine().lemmatize('tweets')
+
+
+def mergeCounts(partials):
+    '''Add up the per-chunk counts from countNgrams into one Counter per output.'''
+    counts = None
+    for partial in partials:
+        if counts is None:
+            counts = partial
+            continue
+        for counter, partialCounter in zip(counts, partial):
+            counter.update(partialCounter)
+    return counts
+
+
+def parallelCountNgrams(executor, dates, texts, outputs, chunkSize=20000):
+    '''Count the n-grams for each day in chunks over a pool of worker processes.
+
+    Keyword arguments:
+    executor -- ProcessPoolExecutor started with initWorker
+    dates -- iterable of the date of each Tweet
+    texts -- iterable of the cleaned text of each Tweet, from cleanTweets
+    outputs -- list of NgramOutput
+    chunkSize -- the number of distinct (date, text) pairs sent to a worker at a time
+
+    Return:
+    counts -- list with a Counter of (date, n-gram) -> count for each output
+
+    '''
+    # Only the distinct texts of each date are sent to the workers
+    dates, texts, occurrences = distinctTexts(dates, texts)
+    dateChunks = [dates[i:i + chunkSize] for i in range(0, len(dates), chunkSize)]
+    textChunks = [texts[i:i + chunkSize] for i in range(0, len(texts), chunkSize)]
+    occurrenceChunks = [occurrences[i:i + chunkSize] for i in range(0, len(occurrences), chunkSize)]
+
+    counts = mergeCounts(executor.map(countNgrams, dateChunks, textChunks, repeat(outputs), occurrenceChunks))
+    return counts or [Counter() for output in outputs]
+
+
+def countsFrame(counter):
+    '''Create the dataframe of the daily counts from a Counter of (date, n-gram) -> count.
+
+    The rows come out in the same order as grouping the exploded n-grams by date
+    and n-gram and then sorting by date.
+
+    '''
+    keys = sorted(counter)
+    countsDf = pd.DataFrame({'date': [key[0] for key in keys],
+                             'tokenized': [key[1] for key in keys],
+                             'counts': [counter[key] for key in keys]},
+                            columns=['date', 'tokenized', 'counts'])
+    return countsDf.sort_values('date')
+
+
+def addCovidPhase(countsDf):
+    '''Add what covid phase each date fell into, the phases are set in covidPhases.py.'''
+    countsDf['covid phase'] = covidPhases.phaseLabels(countsDf['date'])
+    return countsDf
+
+
+def chunkCounts(tweetFile, outputs, startDate=None, endDate=None, workers=1, chunksize=0, idFilter=None):
+    '''Read the Tweets and count the n-grams of each chunk for every output.
+
+    Keyword arguments:
+    tweetFile -- allTweets.csv or the allTweets_parquet store
+    outputs -- list of NgramOutput
+    startDate -- (optional) the first date of Tweets to process
+    endDate -- (optional) the last date of Tweets to process
+    workers -- the number of processes to tokenize with
+    chunksize -- the number of Tweets read at a time, 0 reads them all at once
+    idFilter -- (optional) IdHashSet of the Tweet ids to skip, the ids counted are added to it.
+        Without one no ids are kept, so memory does not grow with the number of Tweets
+
+    Yield:
+    counts -- list with a Counter of (date, n-gram) -> count for each output, for one chunk
+
+    '''
+    # Get the file, only the columns and dates needed are read from the Parquet store
+    columns = ['id', 'timestamp', 'text']
+    if chunksize:
+        chunks = tweetStore.iterTweets(tweetFile, columns, startDate, endDate, chunksize)
+    else:
+        chunks = [tweetStore.readTweets(tweetFile, columns, startDate, endDate)]
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=initWorker) if workers > 1 else None
+
+    try:
+        # Repeated rows are dropped across chunks as over the whole file, the ids are
+        # only tracked for callers which skip the Tweets counted by earlier runs
+        for chunk in tweetStore.dropDuplicateTweets(chunks):
+            if idFilter is not None:
+                chunk = chunk[idFilter.addNew(chunk['id'].to_numpy())]
+
+            # Create a date column, the timestamp is already a datetime
+            dates = chunk['timestamp'].dt.date
+            texts = cleanTweets(chunk['text'])
+
+            if executor is not None:
+                yield parallelCountNgrams(executor, dates, texts, outputs)
+            else:
+                yield countNgrams(dates, texts, outputs)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def countTweets(tweetFile, outputs, startDate=None, endDate=None, workers=1, chunksize=0, idFilter=None):
+    '''Read and count the n-grams of the Tweets for every output.
+
+    Takes the same arguments as chunkCounts.
+
+    Return:
+    counts -- list with a Counter of (date, n-gram) -> count for each output
+
+    '''
+    counts = None
+    for partial in chunkCounts(tweetFile, outputs, startDate, endDate, workers, chunksize, idFilter):
+        counts = partial if counts is None else mergeCounts([counts, partial])
+    return counts or [Counter() for output in outputs]
+
+
+def writeOutputs(outputs, counts, outputFormat='csv'):
+    '''Write the daily counts for every output as csv, as a count matrix or both.
+
+    Keyword arguments:
+    outputs -- list of NgramOutput
+    counts -- list with a Counter of (date, n-gram) -> count for each output
+    outputFormat -- csv, matrix or both
+
+    Return:
+    countsDfs -- list with the dataframe of daily counts for each output
+
+    '''
+    countsDfs = []
+    for output, counter in zip(outputs, counts):
+        countsDf = addCovidPhase(countsFrame(counter))
+        if outputFormat in ('csv', 'both'):
+            countsDf.to_csv(output.fileName, index = False)
+            print('{} created'.format(output.fileName))
+            print(countsDf.head())
+        if outputFormat in ('matrix', 'both'):
+            tokenMatrix.writeCountMatrix(countsDf, os.path.splitext(output.fileName)[0])
+        countsDfs.append(countsDf)
+
+    return countsDfs
+
+
+def runPipeline(tweetFile, outputs, startDate=None, endDate=None, workers=1, chunksize=0, outputFormat='csv'):
+    '''Read the Tweets once and write the daily counts for every output.
+
+    Keyword arguments:
+    tweetFile -- allTweets.csv or the allTweets_parquet store
+    outputs -- list of NgramOutput
+    startDate -- (optional) the first date of Tweets to process, None or "" for no start
+    endDate -- (optional) the last date of Tweets to process, None or "" for no end
+    workers -- the number of processes to tokenize with
+    chunksize -- the number of Tweets read at a time, 0 reads them all at once
+    outputFormat -- csv, matrix or both
+
+    Return:
+    countsDfs -- list with the dataframe of daily counts for each output
+
+    '''
+    # An empty date on the command line leaves the range open so the later options can be given
+    counts = countTweets(tweetFile, outputs, startDate or None, endDate or None, workers, chunksize)
+    countsDfs = writeOutputs(outputs, counts, outputFormat)
+
+    if workers == 1:
+        print(tokenizerEngine.sharedEngine().cacheReport())
+    return countsDfs
+
+
+def main(tweetFile, ngramSizes='1,2', startDate=None, endDate=None, workers=1, chunksize=0, outputFormat='csv'):
+    outputs = [ngramOutput(n) for n in str(ngramSizes).split(',')]
+    runPipeline(tweetFile, outputs, startDate, endDate, int(workers), int(chunksize), outputFormat)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
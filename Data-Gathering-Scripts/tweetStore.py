@@ -0,0 +1,178 @@
+'''
+Reads and writes the combined Tweets as a typed, compressed Parquet dataset
+partitioned by date, e.g. allTweets_parquet/date=2020-03-01/<part>.parquet.
+
+The downstream scripts call readTweets with the columns and the date range they
+need. With the Parquet store only those columns and date partitions are read
+(memory-mapped), and the timestamps are already stored as datetimes. The same
+scripts still accept the allTweets.csv file. iterTweets reads either one a chunk
+of rows at a time for scripts which stream through the Tweets, and
+dropDuplicateTweets drops the rows repeated across those chunks.
+
+Requires pyarrow for the Parquet store: pip install pyarrow
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+CSV_DTYPES = {'id': 'int64', 'text': 'object', 'hashtag': 'object', 'location': 'object',
+              'lang': 'category', 'sentimentScore': 'float64', 'status': 'category'}
+
+
+def writeTweetStore(tweetFile, storeDirectory='allTweets_parquet', chunksize=500000):
+    '''Convert the combined Tweet CSV to a Parquet dataset partitioned by date.
+
+    Keyword arguments:
+    tweetFile -- the combined Tweet CSV, e.g. allTweets.csv
+    storeDirectory -- the folder for the Parquet dataset, replaced if it exists
+    chunksize -- the number of rows converted at a time
+
+    Return:
+    numRows -- the number of Tweets written
+
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.exists(storeDirectory):
+        shutil.rmtree(storeDirectory)
+
+    numRows = 0
+    for chunk in pd.read_csv(tweetFile, dtype=CSV_DTYPES, chunksize=chunksize):
+        chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+        chunk['date'] = chunk['timestamp'].dt.strftime('%Y-%m-%d')
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        pq.write_to_dataset(table, storeDirectory, partition_cols=['date'], compression='snappy')
+        numRows += len(chunk)
+
+    print('{} created with {} Tweets'.format(storeDirectory, numRows))
+    return numRows
+
+
+def dateFilters(startDate=None, endDate=None):
+    '''Create the pyarrow partition filters for a date range.'''
+    filters = []
+    if startDate is not None:
+        filters.append(('date', '>=', str(pd.Timestamp(startDate).date())))
+    if endDate is not None:
+        filters.append(('date', '<=', str(pd.Timestamp(endDate).date())))
+    return filters or None
+
+
+def csvColumns(columns, startDate=None, endDate=None):
+    '''Get the columns and dtypes to read from the CSV, adding timestamp when it is needed to filter the dates.'''
+    readColumns = columns
+    if columns is not None and (startDate is not None or endDate is not None) and 'timestamp' not in columns:
+        readColumns = columns + ['timestamp']
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items()
+              if readColumns is None or column in readColumns}
+    return readColumns, dtypes
+
+
+def filterCsvTweets(tweets, columns=None, startDate=None, endDate=None):
+    '''Parse the timestamps of Tweets read from the CSV and keep the dates and columns requested.'''
+    if 'timestamp' in tweets.columns:
+        tweets['timestamp'] = pd.to_datetime(tweets['timestamp'])
+    if startDate is not None:
+        tweets = tweets[tweets['timestamp'] >= pd.Timestamp(startDate)]
+    if endDate is not None:
+        tweets = tweets[tweets['timestamp'] < pd.Timestamp(endDate) + pd.Timedelta(days=1)]
+
+    return tweets if columns is None else tweets[columns]
+
+
+def readTweets(tweetFile, columns=None, startDate=None, endDate=None):
+    '''Read the combined Tweets from the Parquet store or from a CSV.
+
+    Keyword arguments:
+    tweetFile -- a Parquet store folder written by writeTweetStore, or the combined Tweet CSV
+    columns -- list of the columns to read, all columns if None
+    startDate -- (optional) first date to read, inclusive
+    endDate -- (optional) last date to read, inclusive
+
+    Return:
+    tweets -- dataframe with the columns requested, timestamp as datetime64
+
+    '''
+    if os.path.isdir(tweetFile):
+        import pyarrow.parquet as pq
+
+        # Only the requested columns and the matching date partitions are read
+        table = pq.read_table(tweetFile, columns=columns, filters=dateFilters(startDate, endDate),
+                              memory_map=True)
+        return table.to_pandas()
+
+    readColumns, dtypes = csvColumns(columns, startDate, endDate)
+    tweets = pd.read_csv(tweetFile, usecols=readColumns, dtype=dtypes)
+    return filterCsvTweets(tweets, columns, startDate, endDate)
+
+
+def iterTweets(tweetFile, columns=None, startDate=None, endDate=None, chunksize=500000):
+    '''Read the combined Tweets a chunk at a time from the Parquet store or from a CSV.
+
+    Keyword arguments:
+    tweetFile -- a Parquet store folder written by writeTweetStore, or the combined Tweet CSV
+    columns -- list of the columns to read, all columns if None
+    startDate -- (optional) first date to read, inclusive
+    endDate -- (optional) last date to read, inclusive
+    chunksize -- the most rows in each chunk
+
+    Yield:
+    tweets -- dataframe of up to chunksize Tweets with the columns requested
+
+    '''
+    if os.path.isdir(tweetFile):
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        dataset = ds.dataset(tweetFile, format='parquet', partitioning='hive')
+        filters = dateFilters(startDate, endDate)
+        batches = dataset.to_batches(columns=columns, batch_size=chunksize,
+                                     filter=pq.filters_to_expression(filters) if filters else None)
+        for batch in batches:
+            if batch.num_rows:
+                yield batch.to_pandas()
+        return
+
+    readColumns, dtypes = csvColumns(columns, startDate, endDate)
+    for tweets in pd.read_csv(tweetFile, usecols=readColumns, dtype=dtypes, chunksize=chunksize):
+        yield filterCsvTweets(tweets, columns, startDate, endDate)
+
+
+def dropDuplicateTweets(chunks):
+    '''Drop the repeated rows from chunks of Tweets read in date order.
+
+    allTweets.csv is sorted by timestamp and the Parquet store is read one date
+    partition after another, so a repeated row is always on the same date as the
+    row it repeats, even when they are in different chunks. A hash of each row of
+    the latest date is kept between chunks, so memory grows with the Tweets of one
+    day and not with the whole corpus. This drops the same rows as drop_duplicates
+    over the whole file.
+
+    Keyword argument:
+    chunks -- iterable of dataframes of Tweets with a timestamp column, in date order
+
+    Yield:
+    tweets -- each chunk without the rows already seen
+
+    '''
+    lastDate = None
+    seen = np.array([], dtype='uint64')
+    for chunk in chunks:
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        keep = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, seen)
+        chunk = chunk[keep]
+        yield chunk
+
+        if len(chunk):
+            dates = chunk['timestamp'].dt.date.to_numpy()
+            newest = dates.max()
+            latest = hashes[keep][dates == newest]
+            seen = np.concatenate([seen, latest]) if newest == lastDate else latest
+            lastDate = newest
@@ -3,7 +3,13 @@ Processes the raw Tweets in a csv file by tokenizing,
 lemmatizing, and creating a row for each word in a tweet.
 
 Keyword arguments:
-tweetFile -- filepath which contains all the Tweets
+tweetFile -- filepath which contains all the Tweets, either allTweets.csv or the
+             allTweets_parquet store written by combineTweetCSVs.py
+startDate -- (optional) the first date of Tweets to process
+endDate -- (optional) the last date of Tweets to process
+workers -- (optional) the number of processes to tokenize with, default 1
+chunksize -- (optional) the number of Tweets read at a time, 0 (default) reads them all at once
+outputFormat -- (optional) csv (default), matrix for a sparse count matrix (see tokenMatrix.py), or both
 
 Output:
  tokenizedTweetsSingleWord.csv -- contains the Tweet id number, words, and date.
@@ -17,104 +23,16 @@ SIADS 591 & 592 Milestone I
 Coronavirus Tweet Analysis Project
 '''
 
-import pandas as pd
-import string
-import numpy as np
-import nltk
-from nltk.stem.wordnet import WordNetLemmatizer
-from nltk.tokenize import TweetTokenizer
-from nltk.corpus import stopwords
-from nltk.util import ngrams
 import sys
+import tweetNgramPipeline
 
 
-def tokenizeLemmatizeTweets(tweet):
-    '''Cleans the raw tweets and produces a list of single words from the tweets.
+def main(tweetFile, startDate=None, endDate=None, workers=1, chunksize=0, outputFormat='csv'):
     
-    Keyword argument:
-    tweet -- the tweet to be processed
-    
-    Return:
-    tokenList -- a list of single words
-
-    ''' 
-    # Create the tokenizer and lemmatizer
-    tokenizer = TweetTokenizer(strip_handles=True, reduce_len=True)
-    lemmatizer = WordNetLemmatizer()
-
-    # Tokenize the Tweet
-    tokenized = tokenizer.tokenize(tweet)
-    
-    # Create variables that store the punctuation and stopwords to be removed
-    # The code to create the swords list and tokenList was found here: https://www.youtube.com/watch?v=7N_2OsLXFlA&list=PLmcBskOCOOFW1SNrz6_yzCEKGvh65wYb9&index=19
-    # The code was modified by including other words to remove and adding the lemmatization function
-    punctuation = list(string.punctuation)
-    swords = stopwords.words('english') + punctuation + ['rt', 'via', '...', 'u', 'ur', 'r', 'n', 'covid', 'coronavirus', 'covid19', 'corona']
-
-    # Create a list of lemmatized words, remove punctuation, stopwords and numbers
-    tokenList = [lemmatizer.lemmatize(word) for word in tokenized if lemmatizer.lemmatize(word) not in swords and not word.isdigit()]
-    
-    return tokenList
-
-def main(tweetFile):
-    
-    # Get the file
-    allTweets = pd.read_csv(tweetFile, usecols = ['id', 'timestamp', 'text'])
-    allTweets = allTweets.drop_duplicates()
-    
-    # Change the timestamp to datetime and create a date column
-    allTweets['timestamp'] = pd.to_datetime(allTweets['timestamp'])
-    allTweets['date']  = allTweets['timestamp'].dt.date
-    
-    # Change all tweets to lowercase and remove any non-ASCII characters
-    # Found code for igonring non-ascii characters: https://stackoverflow.com/questions/36340627/remove-non-ascii-characters-from-pandas-column
-    # modified the code by adding str.lower()
-    allTweets['text'] = allTweets['text'].str.lower().str.encode('ascii', 'ignore').str.decode('ascii')
-    
-    # Remove all links and hashtag symbols
-    allTweets = allTweets.replace({'text': {r"http\S+": "", '#{1,}': "", '\n':""}}, regex=True)
-    
-    # Add the tokenized words column
-    allTweets['tokenized'] = allTweets['text'].apply(tokenizeLemmatizeTweets)
-    
-    # Reduce the dataframe and explode the tokens to their own rows
-    allTweets = allTweets[['id','date', 'tokenized']]
-    allTweets = allTweets.explode('tokenized')
-
-    # Aggregate all the words by date
-    allTweets = allTweets.groupby(['date', 'tokenized']).count().reset_index().sort_values('date')
-    allTweets.rename(columns = {'id': 'counts'}, inplace = True)
-
-    # Add what covid phase the word fell into
-    # Create a list of dates for each phase
-    phase1Dates = list(pd.date_range('2020-03-01', '2020-04-07', freq = 'D'))
-    phase2Dates = list(pd.date_range('2020-04-08', '2020-05-12', freq = 'D'))
-    phase3Dates = list(pd.date_range('2020-05-13', '2020-07-28', freq = 'D'))
-    phase4Dates = list(pd.date_range('2020-07-29', '2020-09-01', freq= 'D'))
-
-    # Put the list of dates into one list
-    allDates = phase1Dates + phase2Dates + phase3Dates + phase4Dates
-
-    # Create lists with the phase labels
-    phase1 = ['phase 1'] * len(phase1Dates)
-    phase2 = ['phase 2'] * len(phase2Dates)
-    phase3 = ['phase 3'] * len(phase3Dates)
-    phase4 = ['phase 4'] * len(phase4Dates)
-
-    # Put the list of labels into one list
-    allPhases = phase1 + phase2 + phase3 + phase4
-
-    # Create a dictionary with the phases and dates
-    phaseDict = dict(zip(allDates, allPhases))
-
-    # Create the phase label column
-    allTweets['covid phase'] = allTweets['date'].map(phaseDict)
-    
-    # Create the csv
-    allTweets.to_csv('tokenizedTweetsSingleWord.csv', index = False)
-    
-    print('tokenizedTweetsSingleWord.csv created')
-    print(allTweets.head())
+    # The pipeline reads, cleans and counts the Tweets, run it with 1,2 to make
+    # the single word and bi-gram files from one pass
+    tweetNgramPipeline.runPipeline(tweetFile, [tweetNgramPipeline.ngramOutput(1)], startDate, endDate,
+                                   int(workers), int(chunksize), outputFormat)
     
 if __name__ == "__main__":
-    main(sys.argv[1])
\ No newline at end of file
+    main(*sys.argv[1:])
\ No newline at end of file
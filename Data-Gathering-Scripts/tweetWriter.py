@@ -0,0 +1,67 @@
+'''
+Writes hydrated Tweets to csv one batch at a time.
+
+Each batch is appended to the current output file as soon as it is hydrated, so
+memory stays bounded by the batch size and the Tweets are on disk while the run
+is still going. When the current file reaches the size limit a new file is started.
+
+Laura Stagnaro, Ian Byrne
+SIADS 591 & 592 Milestone I
+Coronavirus Tweet Analysis Project
+'''
+
+import pandas as pd
+
+COLUMNS = ['id', 'timestamp', 'text', 'hashtag', 'location', 'lang', 'status', 'sentimentScore']
+
+
+class RollingCsvWriter:
+    '''Appends batches of Tweets to csv files which roll over at a set size.
+
+    Keyword arguments:
+    filePrefix -- path of the first output file without ".csv". Later files
+        get _1, _2, ... added to the prefix.
+    maxBytes -- size in bytes at which a new file is started, 0 for no limit
+
+    '''
+    def __init__(self, filePrefix, maxBytes=0):
+        self.filePrefix = filePrefix
+        self.maxBytes = maxBytes
+        self.file = None
+        self.fileNames = []
+        self.rows = 0
+
+    def nextFile(self):
+        '''Close the current file and start the next one with a header row.'''
+        if self.file is not None:
+            self.file.close()
+
+        if self.fileNames:
+            fileName = '{}_{}.csv'.format(self.filePrefix, len(self.fileNames))
+        else:
+            fileName = self.filePrefix + '.csv'
+        self.fileNames.append(fileName)
+
+        self.file = open(fileName, 'w', newline='', encoding='utf-8')
+        pd.DataFrame(columns=COLUMNS).to_csv(self.file, index=False)
+
+    def write(self, tweetDict):
+        '''Append a batch of Tweets.
+
+        Keyword argument:
+        tweetDict -- dictionary of lists with the Tweet information for the batch
+
+        '''
+        if self.file is None or (self.maxBytes and self.file.tell() >= self.maxBytes):
+            self.nextFile()
+
+        batch = pd.DataFrame(tweetDict, columns=COLUMNS)
+        batch.to_csv(self.file, header=False, index=False)
+        self.file.flush()
+        self.rows += len(batch)
+
+    def close(self):
+        '''Close the current file, creating an empty one if nothing was written.'''
+        if self.file is None:
+            self.nextFile()
+        self.file.close()
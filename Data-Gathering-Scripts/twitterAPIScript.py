@@ -14,9 +14,29 @@ nextTweet -- the index number of the Tweet in the file you want to start process
              needs to be a multiple of 100
 numTweet -- the number of Tweets you want to process, needs to be a multiple of 100 or 
             or "All" if you want to get all tweets at once
+workers -- (optional) number of lookups to keep in flight at once. When more than 1 the
+           concurrent hydrator in tweetHydrator.py is used instead of tweepy
+baseUrl -- (optional) url of the Twitter API for the concurrent hydrator, can point at
+           the local fake API in fakeTwitterApi.py for testing
+cacheFile -- (optional) SQLite file of Tweets which were already hydrated, default
+             hydrationCache.db. Only the ids which are not in it are sent to the API.
+             Pass "" to turn the cache off.
+maxFileMB -- (optional) size in MB at which a new output file is started, default 0 for
+             a single file
 
 Output:
-tweet_data/covidTweets_(date_time).csv -- contains the tweet information
+tweet_data/covidTweets_(date_time).csv -- contains the tweet information. Each batch is
+    appended as soon as it is hydrated. When maxFileMB is set the following files are
+    named covidTweets_(date_time)_1.csv, covidTweets_(date_time)_2.csv, ...
+
+Job mode:
+    python twitterAPIScript.py job tweetIdFile [flushEvery] [workers] [baseUrl] [cacheFile]
+
+Hydrates every Tweet id in tweetIdFile without any start index bookkeeping. The output
+is written to tweet_data/covidTweets_(id file)_(first batch)-(last batch).csv after every
+flushEvery batches of 100 ids (default 50) and the completed batch range is then added to
+the journal file (tweetIdFile).journal. Running the same command again after a crash or
+a rate limit stop picks up at the first batch which is not in the journal.
 
 Laura Stagnaro, Ian Byrne
 SIADS 591 & 592 Milestone I
@@ -29,10 +49,14 @@ import json
 import pandas as pd
 import numpy as np
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import partial
 import sys
 import os
 from datetime import datetime
+import tweetHydrator
+from hydrationCache import HydrationCache
+from tweetWriter import COLUMNS, RollingCsvWriter
     
 def setupApi(tokenSecretFile):
     '''Sets up the Twitter API.
@@ -67,6 +91,58 @@ def setupApi(tokenSecretFile):
         print("Error during authentication")
     return api
 
+class TweetIdBatches:
+    '''Groups of 100 tweet ids taken as views of one int64 array, so no Python int objects are created.
+    
+    Keyword arguments:
+    tweetIds -- int64 numpy array of tweet ids
+    batchSize -- the number of tweet ids in each group
+    
+    '''
+    def __init__(self, tweetIds, batchSize=100):
+        self.tweetIds = tweetIds
+        self.batchSize = batchSize
+    
+    def __len__(self):
+        return -(-len(self.tweetIds) // self.batchSize) # The last group can be smaller than batchSize
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('Groups of tweet ids can only be sliced with a step of 1')
+            return TweetIdBatches(self.tweetIds[start * self.batchSize:stop * self.batchSize], self.batchSize)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('group of tweet ids out of range')
+        return self.tweetIds[index * self.batchSize:(index + 1) * self.batchSize]
+    
+    def __iter__(self):
+        for start in range(0, len(self.tweetIds), self.batchSize):
+            yield self.tweetIds[start:start + self.batchSize]
+
+class SentimentScores:
+    '''Sentiment scores sorted by tweet id and found with a binary search.
+    
+    Keyword arguments:
+    tweetIds -- int64 numpy array of tweet ids
+    scores -- numpy array with the sentiment score of each tweet id
+    
+    '''
+    def __init__(self, tweetIds, scores):
+        order = np.argsort(tweetIds, kind='stable')
+        self.tweetIds = tweetIds[order]
+        self.scores = scores[order]
+    
+    def lookup(self, tweetIds):
+        '''Get the sentiment scores for a group of tweet ids, NaN for any id which is not in the file.
+        If an id is in the file more than once the score of the last one is used.'''
+        tweetIds = np.asarray(tweetIds, dtype=np.int64)
+        positions = np.searchsorted(self.tweetIds, tweetIds, side='right') - 1
+        found = (positions >= 0) & (self.tweetIds[positions.clip(0)] == tweetIds)
+        return np.where(found, self.scores[positions.clip(0)], np.nan)
+
 def getTweetIds(tweetIdFile):
     '''Get the tweet Ids to run through the Twitter Api as well as the sentiment scores for each Tweet.
     
@@ -74,28 +150,24 @@ def getTweetIds(tweetIdFile):
     tweetIdFile -- csv filed which contains the tweet id and sentiment score
     
     Return:
-    tweetIdsList -- list of lists. Each list includes 100 tweet ids
-    sentimentDict -- dictionary with the tweet ids as the key and sentiment score as the value
+    tweetIdsList -- TweetIdBatches, the tweet ids in groups of 100
+    sentimentScores -- SentimentScores to look up the sentiment score of each tweet id
     
     '''
     # Create a dataframe with the tweet ids and sentiment scores
     tweetIdDf = pd.read_csv(tweetIdFile, usecols = ['tweet_id', 'sentiment_score'],
         dtype={'tweet_id': np.int64}, float_precision = 'high')
     
-    # Get a list of lists for the tweet ids. Each list contains 100 tweet ids
-    tweetIds = tweetIdDf['tweet_id'].to_list()
-    remainder = len(tweetIds) % 100 # This is the number of tweet ids which will be in the last list
-    startEnd = zip(range(0, len(tweetIds)-remainder, 100),range(100, len(tweetIds), 100)) # Create a zip of tuples with what index to start and stop at to create the list of 100 tweet ids 
-    tweetIdsList = [tweetIds[i:x] for i,x in startEnd] # Create the list of lists
-    if remainder > 0:
-        tweetIdsList.append(list(tweetIds[len(tweetIds)-remainder : len(tweetIds)])) # Append the last list
+    # Keep the tweet ids as one int64 array, each group of 100 is a view of it
+    tweetIds = tweetIdDf['tweet_id'].to_numpy()
+    tweetIdsList = TweetIdBatches(tweetIds)
     
-    # Create a dictionary which includes the tweet ids as the key and sentiment score as the value
-    sentimentDict = dict(zip(tweetIdDf['tweet_id'].to_list(), tweetIdDf['sentiment_score'].to_list()))
+    # Sort the sentiment scores by tweet id so they can be found with a binary search
+    sentimentScores = SentimentScores(tweetIds, tweetIdDf['sentiment_score'].to_numpy())
     
     # Print out the number of Tweet ids in the list
     print('There are {} Tweet Ids'.format(len(tweetIdDf)))
-    return tweetIdsList, sentimentDict
+    return tweetIdsList, sentimentScores
 
 def parseTweet(tweetContent):
     '''Get the necessary information from the Tweet.
@@ -135,9 +207,134 @@ def parseTweet(tweetContent):
     return idVal, timestamp, text, hashtags, location, lang, status
 
 
-def main(tweetIdFile, nextTweet, numTweets):
-    '''Create a dataframe which includes all the necessary Tweet information. The API searches for 100 tweet ids at
-    one time.
+def lookupTweets(lookup):
+    '''Run a lookup and parse the Tweets which are returned.
+    
+    Keyword argument:
+    lookup -- function which returns the json for the Tweets found
+    
+    Return:
+    tweets -- list of (idVal, timestamp, text, hashtags, location, lang, status) tuples
+    
+    '''
+    return [parseTweet(tweet) for tweet in lookup()]
+
+def uncachedGroups(tweetGroups, cache, cachedQueue):
+    '''Reduce each group of Tweet ids to the ids which are not in the cache.
+    
+    Keyword arguments:
+    tweetGroups -- iterable of lists of up to 100 tweet ids
+    cache -- the HydrationCache
+    cachedQueue -- deque which gets (cached, missIds) added for each group, in order
+    
+    Return:
+    generator of the lists of tweet ids which need to be looked up
+    
+    '''
+    for tweetGroup in tweetGroups:
+        cached = cache.get(tweetGroup)
+        missIds = [tweetId for tweetId in tweetGroup if int(tweetId) not in cached]
+        cachedQueue.append((cached, missIds))
+        yield missIds
+
+def lookupWithCache(cache, cached, missIds, lookup):
+    '''Run the lookup for the ids which were not cached, add the results to the cache
+    and combine them with the cached Tweets.
+    
+    Keyword arguments:
+    cache -- the HydrationCache
+    cached -- dictionary of the cached Tweets for the group, None for known missing Tweets
+    missIds -- the tweet ids which were looked up
+    lookup -- function which returns the parsed Tweets for missIds
+    
+    Return:
+    tweets -- list of (idVal, timestamp, text, hashtags, location, lang, status) tuples
+    
+    '''
+    found = lookup()
+    foundIds = {tweet[0] for tweet in found}
+    cache.put(found, [tweetId for tweetId in missIds if int(tweetId) not in foundIds])
+    return [tweet for tweet in cached.values() if tweet is not None] + found
+
+def startLookups(tweetGroups, tokenSecretFile, workers=1, baseUrl=tweetHydrator.TWITTER_API, cache=None):
+    '''Set up the API and start looking up the groups of Tweet ids.
+    
+    Keyword arguments:
+    tweetGroups -- list of lists of up to 100 tweet ids
+    tokenSecretFile -- a text file which includes a dictionary with Twitter token and consumer information
+    workers -- the number of lookups to keep in flight. Uses the concurrent hydrator when more than 1.
+    baseUrl -- the url of the Twitter API used by the concurrent hydrator.
+    cache -- (optional) HydrationCache, only the ids which are not in it are sent to the API
+    
+    Return:
+    lookups -- generator of functions, one per group, which return the parsed Tweets found for that group
+    rateLimitRemaining -- function which returns the remaining rate limit
+    
+    '''
+    if cache is not None:
+        cachedQueue = deque()
+        tweetGroups = uncachedGroups(tweetGroups, cache, cachedQueue)
+    
+    if workers > 1:
+        # Keep several lookups in flight, the rate limit is tracked from the response headers
+        hydrator = tweetHydrator.Hydrator.fromSecrets(tokenSecretFile, baseUrl=baseUrl, workers=workers)
+        lookups = (partial(lookupTweets, future.result) for future in hydrator.hydrate(tweetGroups))
+        rateLimitRemaining = hydrator.limiter.remaining # Tracked locally, no extra request needed
+    else:
+        # Setup the Twitter API and look up one group at a time
+        api = setupApi(tokenSecretFile)
+        # A group where every Tweet was in the cache does not need a lookup
+        lookups = (partial(lookupTweets, partial(api.statuses_lookup, list(tweetGroup), tweet_mode='extended') if len(tweetGroup) else list)
+                   for tweetGroup in tweetGroups)
+        rateLimitRemaining = lambda: api.rate_limit_status()['resources']['statuses']['/statuses/lookup']['remaining']
+    
+    if cache is not None:
+        # The queue entry for a group is added before its lookup is yielded
+        lookups = (partial(lookupWithCache, cache, *cachedQueue.popleft(), lookup) for lookup in lookups)
+    
+    return lookups, rateLimitRemaining
+
+def collectTweets(tweetDict, tweetGroup, lookup, sentimentScores):
+    '''Run the lookup for one group of Tweet ids and add the Tweet information to tweetDict.
+    
+    Keyword arguments:
+    tweetDict -- default dictionary of lists which holds the Tweet information
+    tweetGroup -- the list of tweet ids being looked up
+    lookup -- function which returns the parsed Tweets found for tweetGroup
+    sentimentScores -- SentimentScores to look up the sentiment score of each tweet id
+    
+    Return:
+    True if the lookup succeeded, False if the API returned an error
+    
+    '''
+    try: 
+        # Access the API (or the cache) and get the Tweet information
+        idVals = []
+        for idVal, timestamp, text, hashtags, location, lang, status in lookup():
+            idVals.append(idVal)
+            tweetDict['id'].append(str(idVal))
+            tweetDict['timestamp'].append(timestamp)
+            tweetDict['text'].append(text)
+            tweetDict['hashtag'].append(hashtags)
+            tweetDict['location'].append(location)
+            tweetDict['lang'].append(lang)
+            tweetDict['status'].append(status)
+        
+        # Look up the sentiment scores for the whole group at once
+        tweetDict['sentimentScore'].extend(sentimentScores.lookup(idVals).tolist())
+
+    except tweepy.TweepError as e:
+        errorMessage = e.args[0][0]['message']
+        errorCode = e.args[0][0]['code']
+        print('Tweet ID {} had the following error: {} Error Code: {}'.format(tweetGroup[0], errorMessage, errorCode))
+        return False
+    
+    return True
+
+def main(tweetIdFile, nextTweet, numTweets, workers=1, baseUrl=tweetHydrator.TWITTER_API, cacheFile='hydrationCache.db',
+         maxFileMB=0):
+    '''Write a csv which includes all the necessary Tweet information. The API searches for 100 tweet ids at
+    one time and each group is appended to the csv once it has been processed.
     
     Keyword arguments:
     tweetIdFile -- a csv file with tweet Ids and sentiment score
@@ -145,74 +342,163 @@ def main(tweetIdFile, nextTweet, numTweets):
     nextTweet -- the next tweet you want to start at. Number needs to be multiple of 100.
     numTweets -- the number of Tweets to process. Number needs to be a multiple of 100 or can use "All" to process all tweets
                 from the nextTweet number to the end of list of tweet ids.
+    workers -- the number of lookups to keep in flight. Uses the concurrent hydrator when more than 1.
+    baseUrl -- the url of the Twitter API used by the concurrent hydrator.
+    cacheFile -- the hydration cache file, or "" to not use the cache.
+    maxFileMB -- the size in MB at which a new output file is started, 0 for a single file.
     
     Return:
-    covidTweets_ csv file
+    covidTweets_ csv files
     
     '''
     # Create the variables
     nextTweet = int(nextTweet)
-    numTweets = int(numTweets)
+    if numTweets != "All":
+        numTweets = int(numTweets)
+    workers = int(workers)
+    maxBytes = int(float(maxFileMB) * 1024 * 1024)
     tokenSecretFile = 'twitterApiSecrets.txt' # This needs to be a text file with a dictionary containing the keys: consumerKey, 
                                           # consumerSecret, token, and tokenSecret.
     
     # Get the Tweet Ids and sentiment scores
-    tweetIds, sentimentDict = getTweetIds(tweetIdFile)
-    
-    # Setup the Twitter API
-    api = setupApi(tokenSecretFile)
+    tweetIds, sentimentScores = getTweetIds(tweetIdFile)
     
-    # Create a default dictionary to hold all Tweet information
-    tweetDict = defaultdict(list)
+    # Create the writer which appends each group of Tweets to the output csv
+    directory = 'tweet_data/'
+    currentDate = datetime.now().strftime("%Y_%m_%d-%I_%M-%S_%p")
+    writer = RollingCsvWriter(directory + 'covidTweets_' + currentDate, maxBytes)
     
     # Iterate through the Tweet Ids
     start = int(nextTweet/100) # This indicates what group to start with
     if numTweets == "All":
-        tweets = tweetIds[start:-1]
+        tweets = tweetIds[start:]
     else:
         numIterations = int(numTweets/100) # This is the number of groups of 100 tweet ids to search
         tweets = tweetIds[start:start + numIterations] # Get only the groups of tweets needed to process
-    for idx, tweetGroup in enumerate(tweets):
+
+    cache = HydrationCache(cacheFile) if cacheFile else None
+    lookups, rateLimitRemaining = startLookups(tweets, tokenSecretFile, workers, baseUrl, cache)
+
+    for idx, (tweetGroup, lookup) in enumerate(zip(tweets, lookups)):
         if idx % 100 == 0:
-            rateLimitRemaining = api.rate_limit_status()['resources']['statuses']['/statuses/lookup']['remaining'] # Get the remaining rate limit
-            print('Rate Limit Remaining: {}'.format(rateLimitRemaining)) # Print the rate limit remaining every 100 searches
+            print('Rate Limit Remaining: {}'.format(rateLimitRemaining())) # Print the rate limit remaining every 100 searches
         
-        # Access the API and get the Tweet information
-        tweetJson = api.statuses_lookup(tweetGroup, tweet_mode='extended') # Gets the json for all 100 tweets in the tweetGroup
-        try: 
-            # Iterate through each tweet json to get the information
-            for tweet in tweetJson:
-                idVal, timestamp, text, hashtags, location, lang, status = parseTweet(tweet)
-                tweetDict['id'].append(str(idVal))
-                tweetDict['timestamp'].append(timestamp)
-                tweetDict['text'].append(text)
-                tweetDict['hashtag'].append(hashtags)
-                tweetDict['location'].append(location)
-                tweetDict['lang'].append(lang)
-                tweetDict['status'].append(status)
-                tweetDict['sentimentScore'].append(sentimentDict[idVal])
-
-        except tweepy.TweepError as e:
-            errorMessage = e.args[0][0]['message']
-            errorCode = e.args[0][0]['code']
-            print('Tweet ID {} had the following error: {} Error Code: {}'.format(idVal, errorMessage, errorCode))
-            continue
-
-    # Create the dataframe
-    twitterDf = pd.DataFrame(tweetDict)
-    
-    # Write the dataframe to a csv
-    directory = 'tweet_data/'
-    currentDate = datetime.now().strftime("%Y_%m_%d-%I_%M-%S_%p")
-    fileName = directory + 'covidTweets_' + currentDate + '.csv'
-    twitterDf.to_csv(fileName, index=False)
-      
+        # Only one group of Tweets is held in memory at a time
+        tweetDict = defaultdict(list)
+        collectTweets(tweetDict, tweetGroup, lookup, sentimentScores)
+        writer.write(tweetDict)
+
+    writer.close()
     
     # Print out the next Tweet id need to start at and the number that are left
-    rateLimitRemaining = api.rate_limit_status()['resources']['statuses']['/statuses/lookup']['remaining']
-    print('Rate Limit Remaining: {}'.format(rateLimitRemaining)) # Print the number of searches left
-    print('Next start: {}'.format((start + numIterations) * 100))
+    print('Rate Limit Remaining: {}'.format(rateLimitRemaining())) # Print the number of searches left
+    if cache is not None:
+        print(cache.report())
+    print('Next start: {}'.format((start + len(tweets)) * 100))
+    for fileName in writer.fileNames:
+        print('File {} created'.format(fileName))
+
+def readJournal(journalFile):
+    '''Get the batches of 100 tweet ids which a job has already finished.
+    
+    Keyword argument:
+    journalFile -- the journal file, each line holds the first and last batch number of a completed range
+    
+    Return:
+    completed -- set of the batch numbers which are finished
+    
+    '''
+    completed = set()
+    if os.path.exists(journalFile):
+        with open(journalFile) as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 2: # Skip a line which was cut off by a crash
+                    completed.update(range(int(parts[0]), int(parts[1]) + 1))
+    return completed
+
+def flushJob(tweetDict, batches, jobName, journalFile):
+    '''Write the Tweets for a range of batches to csv and then record the range in the journal.
+    
+    Keyword arguments:
+    tweetDict -- default dictionary of lists which holds the Tweet information
+    batches -- list of the batch numbers included in tweetDict
+    jobName -- name used for the output files
+    journalFile -- the journal file
+    
+    '''
+    fileName = 'tweet_data/covidTweets_{}_{}-{}.csv'.format(jobName, batches[0], batches[-1])
+    pd.DataFrame(tweetDict, columns=COLUMNS).to_csv(fileName, index=False)
+    
+    # Only record the batches once their Tweets are on disk
+    with open(journalFile, 'a') as file:
+        file.write('{} {}\n'.format(batches[0], batches[-1]))
+        file.flush()
+        os.fsync(file.fileno())
     print('File {} created'.format(fileName))
 
+def runJob(tweetIdFile, flushEvery=50, workers=1, baseUrl=tweetHydrator.TWITTER_API, cacheFile='hydrationCache.db'):
+    '''Hydrate all the Tweet ids in a file, resuming from the journal if the job was run before.
+    
+    Keyword arguments:
+    tweetIdFile -- a csv file with tweet Ids and sentiment score
+    flushEvery -- the number of batches of 100 tweet ids to gather before writing them to csv
+    workers -- the number of lookups to keep in flight. Uses the concurrent hydrator when more than 1.
+    baseUrl -- the url of the Twitter API used by the concurrent hydrator.
+    cacheFile -- the hydration cache file, or "" to not use the cache.
+    
+    Return:
+    covidTweets_ csv files and the tweetIdFile.journal file
+    
+    '''
+    flushEvery = int(flushEvery)
+    workers = int(workers)
+    tokenSecretFile = 'twitterApiSecrets.txt'
+    journalFile = tweetIdFile + '.journal'
+    jobName = os.path.splitext(os.path.basename(tweetIdFile))[0]
+    
+    # Get the Tweet Ids and find the batches which still need to be processed
+    tweetIds, sentimentScores = getTweetIds(tweetIdFile)
+    completed = readJournal(journalFile)
+    todo = [batch for batch in range(len(tweetIds)) if batch not in completed]
+    print('{} of {} batches already completed'.format(len(tweetIds) - len(todo), len(tweetIds)))
+    
+    tweets = (tweetIds[batch] for batch in todo)
+    cache = HydrationCache(cacheFile) if cacheFile else None
+    lookups, rateLimitRemaining = startLookups(tweets, tokenSecretFile, workers, baseUrl, cache)
+    
+    tweetDict = defaultdict(list)
+    batches = []
+    failed = 0
+    for idx, (batch, lookup) in enumerate(zip(todo, lookups)):
+        tweetGroup = tweetIds[batch]
+        if idx % 100 == 0:
+            print('Rate Limit Remaining: {}'.format(rateLimitRemaining()))
+        
+        # Write out a range as soon as it is full or the next batch does not follow on from it
+        if batches and (len(batches) == flushEvery or batch != batches[-1] + 1):
+            flushJob(tweetDict, batches, jobName, journalFile)
+            tweetDict = defaultdict(list)
+            batches = []
+        
+        # A batch which failed is left out of the journal so the next run retries it
+        if collectTweets(tweetDict, tweetGroup, lookup, sentimentScores):
+            batches.append(batch)
+        else:
+            failed += 1
+    
+    if batches:
+        flushJob(tweetDict, batches, jobName, journalFile)
+    if cache is not None:
+        print(cache.report())
+    if failed:
+        print('{} of {} batches failed and are not in {}, run the job again to retry them'.format(
+            failed, len(tweetIds), journalFile))
+    else:
+        print('Job complete, all {} batches in {}'.format(len(tweetIds), journalFile))
+
 if __name__ == "__main__":
-    main(sys.argv[1], sys.argv[2], sys.argv[3])
+    if sys.argv[1] == 'job':
+        runJob(*sys.argv[2:])
+    else:
+        main(*sys.argv[1:])
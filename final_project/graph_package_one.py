@@ -9,13 +9,39 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
 
-def read_day_counts():
+def read_count_matrix(prefix):
+    """Reads daily counts saved as a sparse date x token matrix
+    (<prefix>_counts.npz, <prefix>_vocab.csv and <prefix>_dates.csv)
+    and returns them in the same long format as the counts csv.
+    Requires scipy, which is only imported when the matrix is read"""
+
+    from scipy import sparse
+
+    matrix = sparse.load_npz(prefix + '_counts.npz').tocoo()
+    vocab = pd.read_csv(prefix + '_vocab.csv', keep_default_na=False)
+    dates = pd.read_csv(prefix + '_dates.csv')
+
+    tokens = vocab.sort_values('id')['token'].to_numpy(dtype=object)
+    df = pd.DataFrame({'date': dates['date'].to_numpy()[matrix.row],
+                       'tokenized': tokens[matrix.col],
+                       'counts': matrix.data,
+                       'covid phase': dates['covid phase'].to_numpy()[matrix.row]})
+
+    return df
+
+
+def read_day_counts(matrix_prefix=None):
     """Reads in the daily word counts file and cleans it:
     - drops the unnamed:0 column
     - sets the date to datetime
+    Pass matrix_prefix (e.g. 'allTokenizedTweetsSingleWord') to load
+    the sparse count matrix instead of parsing the csv
     """
 
-    df = pd.read_csv('allTokenizedTweetsSingleWord.csv')
+    if matrix_prefix is None:
+        df = pd.read_csv('allTokenizedTweetsSingleWord.csv')
+    else:
+        df = read_count_matrix(matrix_prefix)
 
     # df.rename(columns={'date': 'string_date'}, inplace=True)
     df['string_date'] = df['date']
@@ -303,15 +329,23 @@ def heatmap():
     fig.show()
 
 
-def emotion_facet():
-    df = read_day_counts()
+def emotion_facet(phase_rollup=None):
+    '''Pass phase_rollup (e.g. 'rollups/tokenizedTweetsSingleWord_phase.csv'
+    from rollupPyramid.py) to read the per phase counts directly instead of
+    summing the daily counts. The rollup counts every mention, without the
+    more than 20 a day cut off of read_day_counts'''
 
     words = ['bored', 'desolate', 'sad', 'worry', 'anger', 'depressed', 'miserable']
 
-    burn_ = df[df['tokenized'].isin(words)]
-
-    grouped_phase = burn_.groupby(['tokenized', 'covid phase']).sum()
-    grouped_phase.reset_index(inplace=True)
+    if phase_rollup is None:
+        df = read_day_counts()
+        burn_ = df[df['tokenized'].isin(words)]
+        grouped_phase = burn_.groupby(['tokenized', 'covid phase']).sum()
+        grouped_phase.reset_index(inplace=True)
+    else:
+        df = pd.read_csv(phase_rollup, keep_default_na=False)
+        grouped_phase = df[df['tokenized'].isin(words)].rename(columns={'period': 'covid phase'})
+        grouped_phase = grouped_phase[['tokenized', 'covid phase', 'counts']]
     grouped_phase['covid phase'] = grouped_phase['covid phase'].str.strip().str[-1]
     grouped_phase.rename(columns={'tokenized': 'Term',
                                   'counts': 'Mentions',